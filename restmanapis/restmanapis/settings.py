@@ -123,6 +123,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'restmanapis.wsgi.application'
+ASGI_APPLICATION = 'restmanapis.asgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -141,6 +142,17 @@ import pymysql
 
 pymysql.install_as_MySQLdb()
 
+# Cache dùng chung giữa các tiến trình (uvicorn, runserver cho trang quản trị, nhiều worker):
+# phiên bản thực đơn, lịch bàn trống, bộ đếm và thống kê đều được đọc/ghi ở đây
+REDIS_URL = config("REDIS_URL", default="redis://127.0.0.1:6379/0")
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+}
+
 AUTH_USER_MODEL = 'restmans.User'
 
 # Password validation
@@ -1,6 +1,6 @@
 from datetime import datetime
 from django.contrib import admin
-from django.db.models import Count, Sum, Avg
+from django.db.models import Count, F, Sum
 from django.db.models.functions import TruncMonth
 from django.template.response import TemplateResponse
 from django.urls import path
@@ -8,7 +8,10 @@ from django.utils.safestring import mark_safe
 from django import forms
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
 import json
-from .models import Category, Dish, Order, OrderDetail, Review, Table, Booking, User, BookingDetail, ReviewReply
+from . import counters, events, exports
+from .paginators import EstimatedCountPaginator
+from .models import (Category, Dish, Order, OrderDetail, Review, Table, Booking, User, BookingDetail, ReviewReply,
+                     DailyRevenue)
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 
@@ -36,21 +39,26 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'is_active', 'dish_count']
     search_fields = ['name']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(dish_count=Count('dishes'))
+
     def dish_count(self, category):
-        return category.dishes.count()
+        return category.dish_count
     dish_count.short_description = "Số lượng món ăn"
+    dish_count.admin_order_field = 'dish_count'
 
 class DishAdmin(admin.ModelAdmin):
     list_display = ['id', "thumbnail", 'name', 'price', 'category', 'is_active', 'created_date']
     search_fields = ['name', 'category__name']
     list_filter = ['category', 'created_date', 'is_active']
+    list_select_related = ['category']
     list_editable = ['price', 'is_active']
     readonly_fields = ['image_preview']
     form = DishForm
 
     def thumbnail(self, obj):
-        if obj.image:
-            return mark_safe(f"<img src='{obj.image.url}' width='60' style='border-radius:5px'/>")
+        if obj.image_variants:
+            return mark_safe(f"<img src='{obj.image_variants['thumbnail']}' width='60' style='border-radius:5px'/>")
         return "—"
 
     thumbnail.short_description = "Ảnh"
@@ -70,8 +78,28 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'total_amount', 'payment_method', 'status', 'created_date']
     search_fields = ['user__username', 'id']
     list_filter = ['status', 'payment_method', 'created_date']
+    list_select_related = ['user']
     readonly_fields = ['total_amount', 'user']
     inlines = [OrderDetailInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ["export_orders_csv", "export_orders_xlsx", "export_lines_csv", "export_lines_xlsx"]
+
+    @admin.action(description="Xuất các hóa đơn đã chọn ra CSV")
+    def export_orders_csv(self, request, queryset):
+        return exports.orders_response(queryset, 'csv')
+
+    @admin.action(description="Xuất các hóa đơn đã chọn ra Excel")
+    def export_orders_xlsx(self, request, queryset):
+        return exports.orders_response(queryset, 'xlsx')
+
+    @admin.action(description="Xuất chi tiết các hóa đơn đã chọn ra CSV")
+    def export_lines_csv(self, request, queryset):
+        return exports.lines_response(OrderDetail.objects.filter(order__in=queryset), 'csv')
+
+    @admin.action(description="Xuất chi tiết các hóa đơn đã chọn ra Excel")
+    def export_lines_xlsx(self, request, queryset):
+        return exports.lines_response(OrderDetail.objects.filter(order__in=queryset), 'xlsx')
 
 class ReviewReplyInline(admin.TabularInline):
     model = ReviewReply
@@ -82,12 +110,16 @@ class ReviewAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'dish', 'rating', 'created_date']
     search_fields = ['user__username', 'dish__name']
     list_filter = ['rating', 'created_date']
+    list_select_related = ['user', 'dish']
     inlines = [ReviewReplyInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 class ReviewReplyAdmin(admin.ModelAdmin):
     list_display = ["id", "review_link", "user", "short_content", "created_date"]
     search_fields = ["content", "user__username", "review__id"]
     list_filter = ["created_date", "user"]
+    list_select_related = ["user"]
     ordering = ["-created_date"]
 
     def short_content(self, obj):
@@ -95,7 +127,7 @@ class ReviewReplyAdmin(admin.ModelAdmin):
     short_content.short_description = "Nội dung phản hồi"
 
     def review_link(self, obj):
-        return f"Đánh giá #{obj.review.id}"
+        return f"Đánh giá #{obj.review_id}"
     review_link.short_description = "Đánh giá gốc"
 
 class BookingAdmin(admin.ModelAdmin):
@@ -103,6 +135,11 @@ class BookingAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'id']
     list_filter = ['status', 'booking_time']
     inlines = [BookingDetailInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').prefetch_related('details__table')
 
     def get_booked_tables(self, booking_obj):
         tables = ", ".join([detail.table.table_number for detail in booking_obj.details.all()])
@@ -127,31 +164,29 @@ class RestaurantAdminSite(admin.AdminSite):
         year = int(request.GET.get('year', current_year))
         month = int(request.GET.get('month', current_month))
 
-        total_revenue = Order.objects.filter(status='COMPLETED').aggregate(total=Sum('total_amount'))['total'] or 0
-        total_completed_orders = Order.objects.filter(status='COMPLETED').count()
+        totals = DailyRevenue.objects.aggregate(revenue=Sum('revenue'), orders=Sum('order_count'))
+        total_revenue = totals['revenue'] or 0
+        total_completed_orders = totals['orders'] or 0
         total_guests_served = Booking.objects.filter(status='COMPLETED').aggregate(total=Sum('number_of_guests'))[
                                   'total'] or 0
 
-        revenue_by_month = Order.objects.filter(
-            created_date__year=year,
-            status='COMPLETED'
+        revenue_by_month = DailyRevenue.objects.filter(
+            day__year=year
         ).annotate(
-            month=TruncMonth('created_date')
+            month=TruncMonth('day')
         ).values('month').annotate(
-            total=Sum('total_amount')
+            total=Sum('revenue')
         ).order_by('month')
 
-        dish_popularity = Dish.objects.annotate(
-            order_count=Count('order_details')
-        ).filter(order_count__gt=0).values('name', 'order_count').order_by('-order_count')[:10]
+        dish_popularity = Dish.objects.filter(ordered_quantity__gt=0).values(
+            'name', order_count=F('ordered_quantity')
+        ).order_by('-order_count')[:10]
 
-        review_counts = Dish.objects.annotate(
-            review_count=Count('reviews')
-        ).filter(review_count__gt=0).values('name', 'review_count').order_by('-review_count')
+        review_counts = Dish.objects.filter(review_count__gt=0).values('name', 'review_count').order_by('-review_count')
 
-        average_ratings = Dish.objects.annotate(
-            avg_rating=Avg('reviews__rating')
-        ).filter(avg_rating__isnull=False).values('name', 'avg_rating').order_by('-avg_rating')
+        average_ratings = Dish.objects.filter(review_count__gt=0).annotate(
+            avg_rating=counters.avg_rating()
+        ).values('name', 'avg_rating').order_by('-avg_rating')
 
         context = {
             'title': f'Thống kê Kinh doanh - {month}/{year}',
@@ -173,6 +208,17 @@ class TableAdmin(admin.ModelAdmin):
     search_fields = ["table_number"]
     list_filter = ["status", "capacity"]
     ordering = ["table_number"]
+    actions = ["mark_available", "mark_cleaning"]
+
+    @admin.action(description="Đánh dấu các bàn đã chọn là Trống")
+    def mark_available(self, request, queryset):
+        changed = events.set_table_status(queryset.values_list('id', flat=True), Table.TableStatus.AVAILABLE)
+        self.message_user(request, f"Đã cập nhật {len(changed)} bàn.")
+
+    @admin.action(description="Đánh dấu các bàn đã chọn là Cần dọn dẹp")
+    def mark_cleaning(self, request, queryset):
+        changed = events.set_table_status(queryset.values_list('id', flat=True), Table.TableStatus.CLEANING)
+        self.message_user(request, f"Đã cập nhật {len(changed)} bàn.")
 
     # Hiển thị status dưới dạng badge màu
     def status_badge(self, obj):
@@ -208,10 +254,10 @@ class UserAdmin(BaseUserAdmin):
     )
 
     def avatar_thumb(self, obj):
-        if obj.avatar:
+        if obj.avatar_variants:
             return format_html(
                 "<img src='{}' width='40' height='40' style='border-radius:50%;object-fit:cover'/>",
-                obj.avatar.url
+                obj.avatar_variants['thumbnail']
             )
         return "—"
     avatar_thumb.short_description = "Ảnh"
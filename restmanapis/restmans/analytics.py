@@ -0,0 +1,123 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce, ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+
+from .models import Order, Booking, BookingDetail, Table, Category, DailyRevenue, DishDailySales
+
+DIMENSIONS = ('hour', 'weekday', 'payment_method', 'table', 'category')
+# Các chiều theo hóa đơn tính được từ bảng doanh thu theo ngày, không cần quét hóa đơn
+ROLLUP_DIMENSIONS = {'weekday', 'payment_method'}
+
+
+def _columns(rows, count):
+    """Chuyển kết quả GROUP BY thành từng cột numpy."""
+    rows = list(rows)
+    if not rows:
+        return [np.empty(0)] * count
+    return [np.asarray(column) for column in zip(*rows)]
+
+
+def _sum_by(keys, labels, *weights):
+    """keys: các khóa đã sắp xếp; cộng từng trọng số của mỗi dòng vào ô của khóa tương ứng."""
+    index = np.searchsorted(keys, labels)
+    return [np.bincount(index, weights=w.astype(float), minlength=len(keys)) for w in weights]
+
+
+def _iso_weekdays(days):
+    # 1970-01-01 là thứ Năm (ISO 4)
+    return (np.asarray(days, dtype='datetime64[D]').astype(int) + 3) % 7 + 1
+
+
+def _rows(key_name, keys, revenue, orders, covers=None, labels=None):
+    result = []
+    for i, key in enumerate(keys.tolist()):
+        row = {key_name: key, **(labels or {}).get(key, {}),
+               'revenue': round(float(revenue[i]), 2), 'orders': int(orders[i])}
+        if covers is not None:
+            row['covers'] = int(round(covers[i]))
+        result.append(row)
+    return result
+
+
+def cube(start, end, dimensions):
+    """
+    Doanh thu, số hóa đơn và số khách của các hóa đơn hoàn thành từ ngày start đến ngày end theo từng chiều.
+    Các chiều theo hóa đơn lấy từ một câu GROUP BY (giờ, thứ, hình thức thanh toán, bàn), hoặc từ bảng
+    doanh thu theo ngày khi chỉ cần thứ và hình thức thanh toán, rồi gộp bằng numpy.
+    Số khách (covers) lấy từ các đơn đặt bàn đã hoàn thành nên chỉ có ở các chiều giờ, thứ và bàn.
+    """
+    range_start = timezone.make_aware(datetime.combine(start, time.min))
+    range_end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    result = {}
+
+    if set(dimensions) - {'category'} <= ROLLUP_DIMENSIONS:
+        days, methods, orders, revenue = _columns(DailyRevenue.objects.filter(day__range=(start, end)).values_list(
+            'day', 'payment_method').annotate(orders=Sum('order_count'), total=Sum('revenue')).order_by(), 4)
+        weekdays = _iso_weekdays(days)
+    else:
+        hours, weekdays, methods, tables, orders, revenue = _columns(Order.objects.filter(
+            status=Order.OrderStatus.COMPLETED, created_date__gte=range_start, created_date__lt=range_end,
+        ).annotate(
+            hour=ExtractHour('created_date'), weekday=ExtractIsoWeekDay('created_date'),
+            table_key=Coalesce('table_id', Value(0)),
+        ).values_list('hour', 'weekday', 'payment_method', 'table_key').annotate(
+            orders=Count('id'), total=Sum('total_amount')).order_by(), 6)
+
+    completed_bookings = Booking.objects.filter(status=Booking.BookingStatus.COMPLETED,
+                                                booking_time__gte=range_start, booking_time__lt=range_end)
+    if {'hour', 'weekday'} & set(dimensions):
+        booking_hours, booking_weekdays, guests = _columns(completed_bookings.annotate(
+            hour=ExtractHour('booking_time'), weekday=ExtractIsoWeekDay('booking_time'),
+        ).values_list('hour', 'weekday').annotate(guests=Sum('number_of_guests')).order_by(), 3)
+
+    if 'hour' in dimensions:
+        keys = np.arange(24)
+        result['hour'] = _rows('hour', keys, *_sum_by(keys, hours, revenue, orders),
+                               *_sum_by(keys, booking_hours, guests))
+
+    if 'weekday' in dimensions:
+        keys = np.arange(1, 8)
+        result['weekday'] = _rows('weekday', keys, *_sum_by(keys, weekdays, revenue, orders),
+                                  *_sum_by(keys, booking_weekdays, guests))
+
+    if 'payment_method' in dimensions:
+        methods = methods.astype(str)
+        keys = np.unique(methods)
+        result['payment_method'] = _rows('payment_method', keys, *_sum_by(keys, methods, revenue, orders))
+
+    if 'table' in dimensions:
+        booking_ids, table_ids, booking_guests = _columns(BookingDetail.objects.filter(
+            booking__in=completed_bookings).values_list('booking_id', 'table_id', 'booking__number_of_guests'), 3)
+        # Khách của đơn đặt nhiều bàn được chia đều cho các bàn đó
+        _, booking_index, tables_per_booking = np.unique(booking_ids, return_inverse=True, return_counts=True)
+        shares = booking_guests.astype(float) / np.maximum(tables_per_booking[booking_index], 1)
+        # Bàn 0: hóa đơn trực tuyến không gắn với bàn nào
+        keys = np.union1d(tables.astype(int), table_ids.astype(int))
+        labels = {t['id']: {'table_number': t['table_number']}
+                  for t in Table.objects.filter(pk__in=keys.tolist()).values('id', 'table_number')}
+        rows = _rows('table_id', keys, *_sum_by(keys, tables, revenue, orders), *_sum_by(keys, table_ids, shares),
+                     labels=labels)
+        for row in rows:
+            if row['table_id'] == 0:
+                row.update(table_id=None, table_number=None)
+        result['table'] = rows
+
+    if 'category' in dimensions:
+        categories, quantities, totals = _columns(DishDailySales.objects.filter(day__range=(start, end)).annotate(
+            category_key=Coalesce('dish__category_id', Value(0)),
+        ).values_list('category_key').annotate(quantity=Sum('quantity'), total=Sum('revenue')).order_by(), 3)
+        categories = categories.astype(int)
+        keys = np.unique(categories)
+        total, quantity = _sum_by(keys, categories, totals, quantities)
+        names = dict(Category.objects.filter(pk__in=keys.tolist()).values_list('id', 'name'))
+        result['category'] = [
+            {'category_id': key or None, 'name': names.get(key, 'Món khác'),
+             'revenue': round(float(total[i]), 2), 'quantity': int(quantity[i])}
+            for i, key in enumerate(keys.tolist())
+        ]
+
+    return result
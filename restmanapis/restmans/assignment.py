@@ -0,0 +1,88 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Booking, BookingDetail, Table
+
+BOOKING_DURATION = timedelta(hours=2)
+
+
+def booking_interval(booking):
+    return booking.booking_time, booking.booking_time + BOOKING_DURATION
+
+
+def best_tables(tables, guests):
+    """Chọn tập bàn có tổng sức chứa >= guests, ít ghế thừa nhất rồi ít bàn nhất (quy hoạch động theo tổng sức chứa)."""
+    # best[s] = tập bàn ít phần tử nhất có tổng sức chứa đúng bằng s
+    best = {0: ()}
+    for table in tables:
+        for total, chosen in list(best.items()):
+            new_total = total + table.capacity
+            if total < guests and (new_total not in best or len(best[new_total]) > len(chosen) + 1):
+                best[new_total] = chosen + (table,)
+    fits = [total for total in best if total >= guests]
+    if not fits:
+        return None
+    return best[min(fits, key=lambda total: (total, len(best[total])))]
+
+
+def solve(bookings, tables, busy):
+    """
+    bookings: các đơn cần gán, tables: các bàn đang hoạt động,
+    busy: {table_id: [(bắt đầu, kết thúc)]} các khoảng đã được đặt.
+    Trả về ({booking_id: [bàn]}, [booking_id không gán được]).
+    """
+    busy = {table_id: list(intervals) for table_id, intervals in busy.items()}
+    assignments, unassigned = {}, []
+    # Đơn đông khách khó xếp hơn nên được xếp trước
+    for booking in sorted(bookings, key=lambda b: (-b.number_of_guests, b.booking_time, b.id)):
+        start, end = booking_interval(booking)
+        free = [t for t in tables if all(e <= start or s >= end for s, e in busy.get(t.id, ()))]
+        chosen = best_tables(free, booking.number_of_guests)
+        if chosen is None:
+            unassigned.append(booking.id)
+            continue
+        assignments[booking.id] = list(chosen)
+        for table in chosen:
+            busy.setdefault(table.id, []).append((start, end))
+    return assignments, unassigned
+
+
+def pending_for_day(day):
+    day_start = timezone.make_aware(datetime.combine(day, time.min))
+    return Booking.objects.filter(status=Booking.BookingStatus.PENDING, booking_time__gte=day_start,
+                                  booking_time__lt=day_start + timedelta(days=1))
+
+
+def busy_intervals(start, end, exclude_booking_ids=()):
+    busy = {}
+    details = BookingDetail.objects.filter(start_time__lt=end, end_time__gt=start).exclude(
+        booking__status=Booking.BookingStatus.CANCELLED).exclude(booking_id__in=exclude_booking_ids)
+    for table_id, s, e in details.values_list('table_id', 'start_time', 'end_time'):
+        busy.setdefault(table_id, []).append((s, e))
+    return busy
+
+
+def propose(bookings, tables=None):
+    bookings = list(bookings)
+    if not bookings:
+        return {}, []
+    if tables is None:
+        tables = Table.objects.filter(is_active=True)
+    start = min(b.booking_time for b in bookings)
+    end = max(b.booking_time for b in bookings) + BOOKING_DURATION
+    busy = busy_intervals(start, end, exclude_booking_ids=[b.id for b in bookings])
+    return solve(bookings, sorted(tables, key=lambda t: t.capacity), busy)
+
+
+def conflicting_table_ids(details, exclude_booking_ids=()):
+    """details: [(table_id, bắt đầu, kết thúc)] -> các bàn trùng lịch với nhau hoặc với đơn khác chưa hủy."""
+    if not details:
+        return set()
+    busy = busy_intervals(min(s for _, s, _ in details), max(e for _, _, e in details), exclude_booking_ids)
+    conflicts = set()
+    for table_id, start, end in details:
+        if any(s < end and e > start for s, e in busy.get(table_id, ())):
+            conflicts.add(table_id)
+        busy.setdefault(table_id, []).append((start, end))
+    return conflicts
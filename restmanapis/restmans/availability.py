@@ -0,0 +1,123 @@
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Booking, BookingDetail
+from . import caches
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+# Bitmap nằm trong cache dùng chung (Redis) và bị vô hiệu khi đơn đặt bàn đổi; thời hạn ngắn chỉ để giới hạn
+# độ lệch nếu lần vô hiệu sau commit bị mất. Gán bàn luôn kiểm tra trùng lịch trên CSDL, không dùng bitmap.
+BITMAP_TIMEOUT = 60 * 10
+OPENING_HOUR = 7
+CLOSING_HOUR = 23
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _days(start, end):
+    day = timezone.localtime(start).date()
+    last = timezone.localtime(end - timedelta(microseconds=1)).date()
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def _mask(start, end, day):
+    # Làm tròn ra ngoài theo ô thời gian: bàn chỉ được coi là trống khi cả ô trống
+    day_start = _day_start(day)
+    slot = timedelta(minutes=SLOT_MINUTES)
+    first = max(int((start - day_start) / slot), 0)
+    last = min(-int(-(end - day_start) // slot), SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def day_intervals(day):
+    day_start = _day_start(day)
+    return BookingDetail.objects.filter(
+        start_time__lt=day_start + timedelta(days=1), end_time__gt=day_start
+    ).exclude(booking__status=Booking.BookingStatus.CANCELLED).values_list('table_id', 'start_time', 'end_time')
+
+
+def _version_key(day):
+    return f'availability-version:{day.isoformat()}'
+
+
+def _bitmap_key(day):
+    # Khóa theo phiên bản: người đọc đã truy vấn trước khi giao dịch ghi commit sẽ ghi vào phiên bản đã bỏ
+    return f'availability:{day.isoformat()}:{caches.get_version(_version_key(day))}'
+
+
+def day_bitmaps(day):
+    """{table_id: bitmap các ô 5 phút đã được đặt} của một ngày, bỏ qua đơn đã hủy."""
+    key = _bitmap_key(day)
+    bitmaps = cache.get(key)
+    if bitmaps is None:
+        bitmaps = {}
+        for table_id, start, end in day_intervals(day):
+            bitmaps[table_id] = bitmaps.get(table_id, 0) | _mask(start, end, day)
+        cache.set(key, bitmaps, BITMAP_TIMEOUT)
+    return bitmaps
+
+
+def busy_table_ids(start, end):
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    if timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    busy = set()
+    if end <= start:
+        return busy
+    for day in _days(start, end):
+        mask = _mask(start, end, day)
+        busy.update(table_id for table_id, bitmap in day_bitmaps(day).items() if bitmap & mask)
+    return busy
+
+
+def day_grid(day, slot_minutes, table_ids):
+    """
+    Quét một lượt các khoảng đặt bàn trong ngày, trả về [(bắt đầu, kết thúc, [bàn bận])] cho từng ô;
+    bàn trống = table_ids trừ bàn bận, để client tự suy ra thay vì duyệt mọi bàn ở mỗi ô.
+    """
+    day_start = _day_start(day)
+    slot = timedelta(minutes=slot_minutes)
+    opening = day_start + timedelta(hours=OPENING_HOUR)
+    closing = day_start + timedelta(hours=CLOSING_HOUR)
+
+    table_ids = set(table_ids)
+    intervals = [(table_id, start, end) for table_id, start, end in day_intervals(day)
+                 if table_id in table_ids and start < closing and end > opening]
+    starts = sorted((start, table_id) for table_id, start, end in intervals)
+    ends = sorted((end, table_id) for table_id, start, end in intervals)
+
+    active = {}
+    i = j = 0
+    grid = []
+    slot_start = opening
+    while slot_start < closing:
+        slot_end = min(slot_start + slot, closing)
+        # Bỏ các khoảng đã kết thúc trước ô này, thêm các khoảng bắt đầu trong ô này
+        while j < len(ends) and ends[j][0] <= slot_start:
+            table_id = ends[j][1]
+            active[table_id] -= 1
+            if not active[table_id]:
+                del active[table_id]
+            j += 1
+        while i < len(starts) and starts[i][0] < slot_end:
+            table_id = starts[i][1]
+            active[table_id] = active.get(table_id, 0) + 1
+            i += 1
+        grid.append((slot_start, slot_end, sorted(active)))
+        slot_start = slot_end
+    return grid
+
+
+def invalidate(intervals):
+    for day in {day for start, end in intervals if start and end and end > start for day in _days(start, end)}:
+        caches.bump_version(_version_key(day))
@@ -0,0 +1,208 @@
+import gzip
+import threading
+import time
+
+import brotli
+
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .models import Category, Dish, Table
+from . import search
+from .renderers import MsgPackRenderer
+from .serializers import CategorySerializer, DishSerializer
+
+MENU_VERSION_KEY = 'menu:version'
+
+
+REVIEW_PAGE_TIMEOUT = 60 * 10
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Khởi tạo bằng thời gian để phiên bản không bị lặp lại khi cache bị xóa
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def get_menu_version():
+    return get_version(MENU_VERSION_KEY)
+
+
+def bump_menu_version():
+    bump_version(MENU_VERSION_KEY)
+
+
+def review_page_key(dish_id, url):
+    return f'dish-reviews:{dish_id}:{get_version(f"dish-reviews-version:{dish_id}")}:{url}'
+
+
+def invalidate_review_page(dish_id):
+    bump_version(f'dish-reviews-version:{dish_id}')
+
+
+FREE_TABLES_KEY = 'tables:free-count'
+# Bộ đếm tự hết hạn để đếm lại từ CSDL, tránh lệch lâu dài
+FREE_TABLES_TIMEOUT = 60 * 5
+
+
+def free_table_count():
+    count = cache.get(FREE_TABLES_KEY)
+    if count is None:
+        count = Table.objects.filter(status=Table.TableStatus.AVAILABLE).count()
+        cache.add(FREE_TABLES_KEY, count, FREE_TABLES_TIMEOUT)
+    return count
+
+
+def adjust_free_table_count(delta):
+    if not delta:
+        return
+    try:
+        cache.incr(FREE_TABLES_KEY, delta)
+    except ValueError:
+        # Chưa có trong cache: lần đọc tiếp theo sẽ đếm lại
+        pass
+
+
+# Kỳ thống kê còn đang diễn ra thì hết hạn nhanh, kỳ đã khép lại thì giữ lâu (vẫn bị xóa khi dữ liệu đổi)
+STATS_TIMEOUT = 60
+STATS_CLOSED_TIMEOUT = 60 * 60 * 24
+
+
+def stats_version_key(name, bucket=''):
+    return f'stats-version:{name}:{bucket}'
+
+
+def invalidate_stats(name, bucket=''):
+    """bucket rỗng: xóa mọi kỳ của loại thống kê này."""
+    bump_version(stats_version_key(name, bucket))
+
+
+def get_stats(name, buckets, params, compute, closed=False):
+    versions = '.'.join(str(get_version(stats_version_key(name, bucket))) for bucket in ('', *buckets))
+    key = f'stats:{name}:{versions}:{params}'
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, STATS_CLOSED_TIMEOUT if closed else STATS_TIMEOUT)
+    return data
+
+
+def not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+MENU_RENDERERS = {'json': JSONRenderer(), 'msgpack': MsgPackRenderer()}
+MENU_ENCODERS = {
+    'br': lambda body: brotli.compress(body, quality=11),
+    'gzip': lambda body: gzip.compress(body, compresslevel=9),
+    'identity': lambda body: body,
+}
+
+
+def menu_encoding(accept_encoding):
+    """Chọn br, rồi gzip, nếu client chấp nhận (q > 0, kể cả qua *); ngược lại không nén."""
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, *params = item.split(';')
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    return next((e for e in ('br', 'gzip') if weights.get(e, weights.get('*', 0)) > 0), 'identity')
+
+
+def _menu_dish(dish):
+    variants = dish['image_variants']
+    return {
+        'id': dish['id'],
+        'name': dish['name'],
+        'price': dish['price'],
+        'image': variants.get('card', dish['image']),
+        'thumbnail': variants.get('thumbnail', dish['image']),
+    }
+
+
+class MenuSnapshot:
+    """Ảnh chụp thực đơn đã serialize sẵn cho một phiên bản danh mục."""
+    max_filters = 256
+
+    def __init__(self, version):
+        self.version = version
+        self.etag = f'"menu-{version}"'
+        self.categories = [dict(c) for c in CategorySerializer(
+            Category.objects.filter(is_active=True), many=True).data]
+        self.dishes = [dict(d) for d in DishSerializer(
+            Dish.objects.filter(is_active=True), many=True).data]
+        self.dishes_by_id = {d['id']: d for d in self.dishes}
+        self._filters = {}
+        self._menu_bodies = {}
+
+    def build_menu(self):
+        groups = {c['id']: {'id': c['id'], 'name': c['name'], 'dishes': []} for c in self.categories}
+        others = {'id': None, 'name': 'Món khác', 'dishes': []}
+        for dish in self.dishes:
+            groups.get(dish['category_id'], others)['dishes'].append(_menu_dish(dish))
+        categories = list(groups.values()) + ([others] if others['dishes'] else [])
+        return {'version': self.version, 'categories': categories}
+
+    def menu_body(self, fmt, encoding):
+        """Thực đơn đầy đủ đã render và nén sẵn, mỗi tổ hợp định dạng/nén chỉ tính một lần."""
+        body = self._menu_bodies.get((fmt, encoding))
+        if body is None:
+            raw = self._menu_bodies.get((fmt, 'identity'))
+            if raw is None:
+                raw = self._menu_bodies[(fmt, 'identity')] = MENU_RENDERERS[fmt].render(self.build_menu())
+            body = self._menu_bodies[(fmt, encoding)] = MENU_ENCODERS[encoding](raw)
+        return body
+
+    def filter_dishes(self, category_id=None, q=None):
+        key = (category_id or '', q or '')
+        dishes = self._filters.get(key)
+        if dishes is None:
+            dishes = self.dishes
+            if q:
+                dishes = [self.dishes_by_id[i] for i in search.search(q) if i in self.dishes_by_id]
+            if category_id:
+                dishes = [d for d in dishes if str(d['category_id']) == str(category_id)]
+            if len(self._filters) >= self.max_filters:
+                self._filters.clear()
+            self._filters[key] = dishes
+        return dishes
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_menu_snapshot():
+    global _snapshot
+    version = get_menu_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = MenuSnapshot(version)
+        return _snapshot
+
@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models import (F, Case, When, Value, Count, Sum, Subquery, OuterRef, ExpressionWrapper, FloatField,
+                              IntegerField)
+from django.db.models.functions import Coalesce, NullIf, Greatest
+
+from .models import Dish, Review, OrderDetail
+from . import caches
+
+
+def avg_rating():
+    return ExpressionWrapper(F('rating_sum') * 1.0 / NullIf(F('review_count'), 0), output_field=FloatField())
+
+
+def shifted(field, delta):
+    # Cột không âm (UNSIGNED trên MySQL): kẹp trước khi cộng để bộ đếm đã lệch về 0 không làm UPDATE lỗi
+    return Greatest(F(field), -delta, output_field=IntegerField()) + delta
+
+
+def add_review_stats(dish_id, count, rating):
+    Dish.objects.filter(pk=dish_id).update(review_count=shifted('review_count', count),
+                                           rating_sum=shifted('rating_sum', rating))
+    transaction.on_commit(lambda: caches.invalidate_stats('reviews'))
+
+
+def add_ordered_quantities(quantities):
+    """quantities: {dish_id: số lượng thay đổi} -> một câu UPDATE cho tất cả các món."""
+    quantities = {dish_id: q for dish_id, q in quantities.items() if q}
+    if not quantities:
+        return
+    delta = Case(*[When(pk=dish_id, then=Value(q)) for dish_id, q in quantities.items()],
+                 default=Value(0), output_field=IntegerField())
+    Dish.objects.filter(pk__in=quantities).update(ordered_quantity=shifted('ordered_quantity', delta))
+    transaction.on_commit(lambda: caches.invalidate_stats('dishes'))
+
+
+def rebuild_counters():
+    def total(queryset, expression):
+        return Coalesce(Subquery(queryset.filter(dish=OuterRef('pk')).values('dish').annotate(
+            total=expression).values('total')), 0)
+
+    transaction.on_commit(lambda: (caches.invalidate_stats('dishes'), caches.invalidate_stats('reviews')))
+    return Dish.objects.update(
+        review_count=total(Review.objects, Count('id')),
+        rating_sum=total(Review.objects, Sum('rating')),
+        ordered_quantity=total(OrderDetail.objects, Sum('quantity')),
+    )
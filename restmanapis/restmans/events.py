@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from oauth2_provider.models import get_access_token_model
+
+from .models import Table
+from . import caches
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBE_TIMEOUT = 5
+RECONNECT_SECONDS = 1
+
+
+def message(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n'
+
+
+_redis = None
+
+
+def redis_client():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis
+
+
+class Broadcaster:
+    """
+    Phát sự kiện Server-Sent Events qua kênh Redis pub/sub, nên thay đổi ghi ở tiến trình khác (trang quản trị,
+    worker khác) cũng tới được các kết nối đang mở. Mỗi tiến trình chỉ giữ một kết nối nghe cho mỗi kênh.
+    """
+
+    def __init__(self, channel, maxsize=100):
+        self.channel = f'events:{channel}'
+        self.maxsize = maxsize
+        self._subscribers = set()
+        self._listener = None
+        self._lock = threading.Lock()
+
+    async def subscribe(self):
+        loop = asyncio.get_running_loop()
+        subscription = (loop, asyncio.Queue(self.maxsize))
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._listener is None or self._listener[0].done() or self._listener[0].get_loop() is not loop:
+                ready = loop.create_future()
+                self._listener = (loop.create_task(self._listen(ready)), ready)
+            ready = self._listener[1]
+        try:
+            # Chờ đăng ký kênh xong rồi mới chụp dữ liệu ban đầu để không lỡ thay đổi nào ở giữa
+            await asyncio.wait_for(asyncio.shield(ready), SUBSCRIBE_TIMEOUT)
+        except BaseException:
+            self.unsubscribe(subscription)
+            raise
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            if self._subscribers or self._listener is None:
+                return
+            task = self._listener[0]
+            self._listener = None
+        try:
+            task.get_loop().call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            # Event loop đã đóng cùng với task
+            pass
+
+    def publish(self, event, data):
+        try:
+            redis_client().publish(self.channel, message(event, data))
+        except redis.RedisError as e:
+            # Không làm hỏng request đã commit; client sẽ tải lại toàn bộ khi kết nối lại
+            logging.error(f"Không gửi được sự kiện {event} lên {self.channel}: {e}")
+
+    def _deliver(self, text):
+        # Có thể gọi từ event loop khác với kết nối, nên đẩy vào hàng đợi qua event loop của từng kết nối
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, text)
+            except RuntimeError:
+                self.unsubscribe((loop, queue))
+
+    async def _listen(self, ready):
+        client = aioredis.Redis.from_url(settings.REDIS_URL)
+        try:
+            while True:
+                try:
+                    async with client.pubsub() as pubsub:
+                        await pubsub.subscribe(self.channel)
+                        async for item in pubsub.listen():
+                            if item['type'] == 'message':
+                                self._deliver(item['data'].decode('utf-8'))
+                            elif item['type'] == 'subscribe':
+                                if ready.done():
+                                    # Vừa kết nối lại: có thể đã lỡ sự kiện nên yêu cầu client tải lại toàn bộ
+                                    self._deliver(message('resync', {}))
+                                else:
+                                    ready.set_result(None)
+                except (redis.RedisError, OSError) as e:
+                    logging.warning(f"Mất kết nối Redis của kênh {self.channel}: {e}")
+                    await asyncio.sleep(RECONNECT_SECONDS)
+        finally:
+            await client.aclose()
+
+    def publish_on_commit(self, event, data):
+        transaction.on_commit(lambda: self.publish(event, data))
+
+    @staticmethod
+    def _put(queue, text):
+        try:
+            queue.put_nowait(text)
+        except asyncio.QueueFull:
+            # Client đọc quá chậm: bỏ các sự kiện cũ và yêu cầu tải lại toàn bộ
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(message('resync', {}))
+
+    async def stream(self, subscription, *initial):
+        try:
+            for text in initial:
+                yield text
+            queue = subscription[1]
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+
+table_status = Broadcaster('table-status')
+kitchen = Broadcaster('kitchen')
+
+
+def table_data(table):
+    return {'id': table.id, 'table_number': table.table_number, 'capacity': table.capacity, 'status': table.status}
+
+
+def publish_tables(tables):
+    for table in tables:
+        table_status.publish_on_commit('table', table_data(table))
+
+
+def set_table_status(table_ids, new_status, only_from=None):
+    """Cập nhật trạng thái nhiều bàn bằng một câu UPDATE và chỉ phát những bàn thực sự đổi trạng thái."""
+    tables = Table.objects.filter(pk__in=table_ids).exclude(status=new_status)
+    if only_from:
+        tables = tables.filter(status__in=only_from)
+    with transaction.atomic():
+        changed = list(tables.select_for_update())
+        if changed:
+            Table.objects.filter(pk__in=[t.id for t in changed]).update(status=new_status)
+            delta = sum((new_status == Table.TableStatus.AVAILABLE) - (t.status == Table.TableStatus.AVAILABLE)
+                        for t in changed)
+            transaction.on_commit(lambda: caches.adjust_free_table_count(delta))
+            for table in changed:
+                table.status = new_status
+            publish_tables(changed)
+    return changed
+
+
+@sync_to_async
+def authenticate(request):
+    """EventSource không gửi được header Authorization nên token được truyền qua ?access_token=."""
+    token = request.GET.get('access_token')
+    if not token:
+        return None
+    token_checksum = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    access_token = get_access_token_model().objects.select_related('user').filter(token_checksum=token_checksum).first()
+    if access_token is None or not access_token.is_valid():
+        return None
+    return access_token.user
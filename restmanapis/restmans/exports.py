@@ -0,0 +1,192 @@
+import csv
+import io
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from itertools import chain
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+
+ORDER_COLUMNS = [
+    ('id', 'Mã hóa đơn'),
+    ('created_date', 'Thời gian tạo'),
+    ('status', 'Trạng thái'),
+    ('payment_method', 'Hình thức thanh toán'),
+    ('table__table_number', 'Bàn'),
+    ('user__username', 'Khách hàng'),
+    ('total_amount', 'Tổng tiền'),
+    ('shipping_address', 'Địa chỉ giao hàng'),
+    ('note', 'Ghi chú'),
+]
+
+LINE_COLUMNS = [
+    ('order_id', 'Mã hóa đơn'),
+    ('order__created_date', 'Thời gian tạo'),
+    ('order__status', 'Trạng thái'),
+    ('order__payment_method', 'Hình thức thanh toán'),
+    ('order__table__table_number', 'Bàn'),
+    ('dish_id', 'Mã món'),
+    ('dish__name', 'Tên món'),
+    ('quantity', 'Số lượng'),
+    ('unit_price', 'Đơn giá'),
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    return '' if value is None else value
+
+
+def iter_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """
+    Đọc từng khối theo khóa chính (WHERE id > khóa cuối LIMIT chunk_size) thay vì một câu SELECT lớn:
+    trình điều khiển MySQL nạp toàn bộ kết quả vào bộ nhớ kể cả khi dùng iterator().
+    """
+    fields = ['pk'] + [name for name, _ in columns]
+    queryset = queryset.order_by('pk').values_list(*fields)
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(chunk[:chunk_size].iterator())
+        for row in rows:
+            yield [_value(v) for v in row[1:]]
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][0]
+
+
+def line_total_rows(rows):
+    # Thêm cột thành tiền = số lượng x đơn giá
+    for row in rows:
+        yield row + [row[-2] * row[-1]]
+
+
+def stream_csv(header, rows, chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    # BOM để Excel nhận đúng tiếng Việt; gửi dòng tiêu đề ngay trước khi truy vấn dữ liệu
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    yield flush()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % chunk_size == 0:
+            yield flush()
+    yield flush()
+
+
+class _Pipe(io.RawIOBase):
+    """Đích ghi không seek được cho ZipFile; các byte đã ghi được lấy ra dần bằng drain()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def stream_xlsx(header, rows, chunk_size=CHUNK_SIZE):
+    """
+    Ghi tệp XLSX tối giản (chuỗi inline, không có style) thẳng vào luồng zip và trả byte ra ngay khi có,
+    nên bộ nhớ không tăng theo số dòng.
+    """
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield pipe.drain()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            lines = []
+            for row in chain([header], rows):
+                lines.append('<row>' + ''.join(_cell(v) for v in row) + '</row>')
+                if len(lines) == chunk_size:
+                    sheet.write(''.join(lines).encode('utf-8'))
+                    lines.clear()
+                    yield pipe.drain()
+            sheet.write(''.join(lines).encode('utf-8') + b'</sheetData></worksheet>')
+    yield pipe.drain()
+
+
+def response(file_type, filename, header, rows):
+    stream = stream_xlsx if file_type == 'xlsx' else stream_csv
+    resp = StreamingHttpResponse(stream(header, rows), content_type=CONTENT_TYPES[file_type])
+    resp['Content-Disposition'] = f'attachment; filename="{filename}.{file_type}"'
+    return resp
+
+
+def orders_response(queryset, file_type, filename='hoa-don'):
+    return response(file_type, filename, [label for _, label in ORDER_COLUMNS], iter_rows(queryset, ORDER_COLUMNS))
+
+
+def lines_response(queryset, file_type, filename='chi-tiet-hoa-don'):
+    header = [label for _, label in LINE_COLUMNS] + ['Thành tiền']
+    return response(file_type, filename, header, line_total_rows(iter_rows(queryset, LINE_COLUMNS)))
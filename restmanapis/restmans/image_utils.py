@@ -0,0 +1,29 @@
+from django.db import transaction
+
+# Các kích thước ảnh dùng trong giao diện, URL được tính sẵn khi ảnh thay đổi
+IMAGE_VARIANTS = {
+    'thumbnail': {'width': 100, 'height': 100, 'crop': 'fill', 'quality': 'auto', 'fetch_format': 'auto'},
+    'card': {'width': 400, 'height': 300, 'crop': 'fill', 'quality': 'auto', 'fetch_format': 'auto'},
+    'full': {},
+}
+
+
+def build_variants(resource):
+    if not resource or not getattr(resource, 'public_id', None):
+        return {}
+    return {name: resource.build_url(**options) if options else resource.url
+            for name, options in IMAGE_VARIANTS.items()}
+
+
+def save_with_variants(instance, save, field_name, variants_name, *args, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and field_name not in update_fields:
+        return save(*args, **kwargs)
+
+    with transaction.atomic():
+        save(*args, **kwargs)
+        field = instance._meta.get_field(field_name)
+        variants = build_variants(field.to_python(getattr(instance, field_name)))
+        if variants != getattr(instance, variants_name):
+            setattr(instance, variants_name, variants)
+            type(instance).objects.filter(pk=instance.pk).update(**{variants_name: variants})
@@ -0,0 +1,30 @@
+from django.db.models import Count, F, Sum
+
+from .models import Order, OrderDetail
+from . import events
+
+# Các hóa đơn bếp còn phải nấu
+OPEN_STATUSES = [Order.OrderStatus.PENDING, Order.OrderStatus.PAID]
+
+
+def open_lines():
+    return list(OrderDetail.objects.filter(order__status__in=OPEN_STATUSES).annotate(
+        table_id=F('order__table_id'), dish_name=F('dish__name')
+    ).values('order_id', 'table_id', 'dish_id', 'dish_name', 'quantity').order_by('order__created_date', 'id'))
+
+
+def cook_now():
+    """Tổng số lượng cần nấu của từng món trên tất cả hóa đơn đang mở."""
+    return list(OrderDetail.objects.filter(order__status__in=OPEN_STATUSES).values(
+        'dish_id', dish_name=F('dish__name')
+    ).annotate(quantity=Sum('quantity'), orders=Count('order_id', distinct=True)).order_by('-quantity', 'dish_id'))
+
+
+def publish_lines(lines):
+    """lines: các dict order_id, table_id, dish_id, dish_name, quantity (số lượng hiện tại, 0 = đã xóa)."""
+    if lines:
+        events.kitchen.publish_on_commit('lines', list(lines))
+
+
+def publish_order_status(order_id, status):
+    events.kitchen.publish_on_commit('order', {'order_id': order_id, 'status': status})
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from restmans import counters
+
+
+class Command(BaseCommand):
+    help = 'Tính lại số lượt đánh giá, tổng số sao và số lượng đã gọi của các món ăn'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = counters.rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f'Đã cập nhật bộ đếm cho {updated} món ăn.'))
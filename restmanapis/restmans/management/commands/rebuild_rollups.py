@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from restmans import rollups
+
+
+class Command(BaseCommand):
+    help = 'Tính lại bảng doanh thu theo ngày và doanh số món ăn theo ngày từ lịch sử hóa đơn'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = rollups.rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Đã tổng hợp lại doanh thu cho {rows} nhóm ngày.'))
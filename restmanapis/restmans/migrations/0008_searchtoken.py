@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:06
+
+import html
+import re
+import unicodedata
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Chép lại cách tách từ của restmans.search tại thời điểm tạo migration: migration không được phụ thuộc
+# vào mã ứng dụng sẽ còn thay đổi
+NAME_WEIGHT = 5
+CATEGORY_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+TOKEN_MAX_LENGTH = 50
+
+_token_re = re.compile(r'[a-z0-9]+')
+_tag_re = re.compile(r'<[^>]*>')
+
+
+def tokenize(text):
+    text = (text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn').lower()
+    return [t[:TOKEN_MAX_LENGTH] for t in _token_re.findall(text)]
+
+
+def dish_tokens(name, category_name, description):
+    weights = Counter()
+    for token in tokenize(name):
+        weights[token] += NAME_WEIGHT
+    for token in tokenize(category_name):
+        weights[token] += CATEGORY_WEIGHT
+    for token in tokenize(html.unescape(_tag_re.sub(' ', description or ''))):
+        weights[token] += DESCRIPTION_WEIGHT
+    return weights
+
+
+def build_index(apps, schema_editor):
+    Dish = apps.get_model('restmans', 'Dish')
+    SearchToken = apps.get_model('restmans', 'SearchToken')
+    tokens = []
+    for dish in Dish.objects.filter(is_active=True).select_related('category').iterator():
+        weights = dish_tokens(dish.name, dish.category.name if dish.category else '', dish.description)
+        tokens.extend(SearchToken(token=t, dish_id=dish.id, weight=w) for t, w in weights.items())
+    SearchToken.objects.bulk_create(tokens, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restmans', '0007_order_shipping_address_alter_order_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50, verbose_name='Từ khóa')),
+                ('weight', models.PositiveIntegerField(default=1, verbose_name='Trọng số')),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='restmans.dish', verbose_name='Món ăn')),
+            ],
+            options={
+                'verbose_name': 'Chỉ mục tìm kiếm',
+                'verbose_name_plural': 'Các chỉ mục tìm kiếm',
+                'unique_together': {('token', 'dish')},
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:08
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Subquery, OuterRef
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Dish = apps.get_model('restmans', 'Dish')
+    Review = apps.get_model('restmans', 'Review')
+    OrderDetail = apps.get_model('restmans', 'OrderDetail')
+
+    def total(model, expression):
+        return Coalesce(Subquery(model.objects.filter(dish=OuterRef('pk')).values('dish').annotate(
+            total=expression).values('total')), 0)
+
+    Dish.objects.update(
+        review_count=total(Review, Count('id')),
+        rating_sum=total(Review, Sum('rating')),
+        ordered_quantity=total(OrderDetail, Sum('quantity')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restmans', '0008_searchtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='ordered_quantity',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Số lượng đã gọi'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Tổng số sao'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Số lượt đánh giá'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+# Chép lại các kích thước ảnh của restmans.image_utils tại thời điểm tạo migration
+IMAGE_VARIANTS = {
+    'thumbnail': {'width': 100, 'height': 100, 'crop': 'fill', 'quality': 'auto', 'fetch_format': 'auto'},
+    'card': {'width': 400, 'height': 300, 'crop': 'fill', 'quality': 'auto', 'fetch_format': 'auto'},
+    'full': {},
+}
+
+
+def build_variants(resource):
+    if not resource or not getattr(resource, 'public_id', None):
+        return {}
+    return {name: resource.build_url(**options) if options else resource.url
+            for name, options in IMAGE_VARIANTS.items()}
+
+
+def fill_variants(apps, schema_editor):
+    for model_name, field_name, variants_name in [('Dish', 'image', 'image_variants'),
+                                                  ('User', 'avatar', 'avatar_variants')]:
+        model = apps.get_model('restmans', model_name)
+        changed = []
+        for obj in model.objects.exclude(**{f'{field_name}__isnull': True}).iterator():
+            setattr(obj, variants_name, build_variants(getattr(obj, field_name)))
+            changed.append(obj)
+        model.objects.bulk_update(changed, [variants_name], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restmans', '0009_dish_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='URL ảnh món ăn'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='URL ảnh đại diện'),
+        ),
+        migrations.RunPython(fill_variants, migrations.RunPython.noop),
+    ]
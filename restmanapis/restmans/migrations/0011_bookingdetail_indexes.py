@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restmans', '0010_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookingdetail',
+            index=models.Index(fields=['table', 'start_time', 'end_time'], name='bookingdetail_table_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingdetail',
+            index=models.Index(fields=['start_time', 'end_time'], name='bookingdetail_time_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restmans', '0011_bookingdetail_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'booking_time'], name='booking_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'booking_time'], name='booking_user_time_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum, Count
+from django.db.models.functions import TruncDate
+
+
+def fill_rollups(apps, schema_editor):
+    # Tự tính từ model lịch sử, không gọi restmans.rollups (mã ứng dụng còn thay đổi và kéo theo cache, serializer)
+    Order = apps.get_model('restmans', 'Order')
+    OrderDetail = apps.get_model('restmans', 'OrderDetail')
+    DailyRevenue = apps.get_model('restmans', 'DailyRevenue')
+    DishDailySales = apps.get_model('restmans', 'DishDailySales')
+    completed = Order.objects.filter(status='COMPLETED')
+
+    rows = {}
+    for r in completed.annotate(day=TruncDate('created_date')).values('day', 'payment_method', 'table_id').annotate(
+            order_count=Count('id'), revenue=Sum('total_amount')):
+        key = (r['day'], r['payment_method'], 'ONLINE' if r['table_id'] is None else 'DINE_IN')
+        row = rows.setdefault(key, DailyRevenue(day=key[0], payment_method=key[1], channel=key[2]))
+        row.order_count += r['order_count']
+        row.revenue += r['revenue']
+    DailyRevenue.objects.bulk_create(rows.values(), batch_size=1000)
+
+    sales = OrderDetail.objects.filter(order__in=completed).annotate(day=TruncDate('order__created_date')).values(
+        'day', 'dish_id').annotate(total_quantity=Sum('quantity'), total_revenue=Sum(F('quantity') * F('unit_price')))
+    DishDailySales.objects.bulk_create([
+        DishDailySales(day=s['day'], dish_id=s['dish_id'], quantity=s['total_quantity'], revenue=s['total_revenue'])
+        for s in sales
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restmans', '0013_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Ngày')),
+                ('payment_method', models.CharField(choices=[('CASH', 'Tiền mặt'), ('VNPAY', 'Ví VNPAY'), ('MOMO', 'Ví MoMo')], max_length=10, verbose_name='Hình thức thanh toán')),
+                ('channel', models.CharField(choices=[('DINE_IN', 'Tại bàn'), ('ONLINE', 'Trực tuyến')], max_length=10, verbose_name='Kênh')),
+                ('order_count', models.IntegerField(default=0, verbose_name='Số hóa đơn')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Doanh thu')),
+            ],
+            options={
+                'verbose_name': 'Doanh thu theo ngày',
+                'verbose_name_plural': 'Doanh thu theo ngày',
+                'unique_together': {('day', 'payment_method', 'channel')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DishDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Ngày')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Số lượng')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Doanh thu')),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='restmans.dish', verbose_name='Món ăn')),
+            ],
+            options={
+                'verbose_name': 'Doanh số món ăn theo ngày',
+                'verbose_name_plural': 'Doanh số món ăn theo ngày',
+                'unique_together': {('day', 'dish')},
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
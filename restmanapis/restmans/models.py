@@ -4,6 +4,8 @@ from ckeditor.fields import RichTextField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from cloudinary.models import CloudinaryField
 
+from .image_utils import save_with_variants
+
 
 class User(AbstractUser):
     class Role(models.TextChoices):
@@ -13,8 +15,12 @@ class User(AbstractUser):
         CUSTOMER = 'CUSTOMER', 'Khách hàng'
 
     avatar = CloudinaryField(null=True)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="URL ảnh đại diện")
     role = models.CharField(max_length=10, choices=Role.choices, default=Role.CUSTOMER, verbose_name="Vai trò")
 
+    def save(self, *args, **kwargs):
+        save_with_variants(self, super().save, 'avatar', 'avatar_variants', *args, **kwargs)
+
 
 class BaseModel(models.Model):
     is_active = models.BooleanField(default=True, verbose_name="Đang hoạt động")
@@ -42,19 +48,47 @@ class Dish(BaseModel):
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)],
                                 verbose_name="Giá tiền")
     image = CloudinaryField(verbose_name="Ảnh món ăn")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="URL ảnh món ăn")
     description = RichTextField(null=True, verbose_name="Mô tả")
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='dishes',
                                  verbose_name="Loại món ăn")
+    # Bộ đếm phi chuẩn hóa, cập nhật trong restmans/counters.py
+    review_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Số lượt đánh giá")
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name="Tổng số sao")
+    ordered_quantity = models.PositiveIntegerField(default=0, editable=False, verbose_name="Số lượng đã gọi")
+
+    COUNTER_FIELDS = ('review_count', 'rating_sum', 'ordered_quantity')
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Không ghi đè bộ đếm bằng giá trị cũ đang có trong bộ nhớ
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name not in self.COUNTER_FIELDS]
+        save_with_variants(self, super().save, 'image', 'image_variants', *args, **kwargs)
+
     class Meta:
         verbose_name = "Món Ăn"
         verbose_name_plural = "Các Món Ăn"
         ordering = ['-id']
 
 
+class SearchToken(models.Model):
+    token = models.CharField(max_length=50, verbose_name="Từ khóa")
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='search_tokens', verbose_name="Món ăn")
+    weight = models.PositiveIntegerField(default=1, verbose_name="Trọng số")
+
+    def __str__(self):
+        return f"{self.token} -> {self.dish_id}"
+
+    class Meta:
+        verbose_name = "Chỉ mục tìm kiếm"
+        verbose_name_plural = "Các chỉ mục tìm kiếm"
+        unique_together = ('token', 'dish')
+
+
 class Order(BaseModel):
     class PaymentMethod(models.TextChoices):
         CASH = 'CASH', 'Tiền mặt'
@@ -93,6 +127,10 @@ class Order(BaseModel):
         verbose_name = "Hóa Đơn"
         verbose_name_plural = "Các Hóa Đơn"
         ordering = ['-created_date']
+        indexes = [
+            models.Index(fields=['user', 'created_date'], name='order_user_created_idx'),
+            models.Index(fields=['status', 'created_date'], name='order_status_created_idx'),
+        ]
 
 
 class OrderDetail(BaseModel):
@@ -117,6 +155,42 @@ class OrderDetail(BaseModel):
         unique_together = ('order', 'dish')
 
 
+class DailyRevenue(models.Model):
+    class Channel(models.TextChoices):
+        DINE_IN = 'DINE_IN', 'Tại bàn'
+        ONLINE = 'ONLINE', 'Trực tuyến'
+
+    day = models.DateField(verbose_name="Ngày")
+    payment_method = models.CharField(max_length=10, choices=Order.PaymentMethod.choices,
+                                      verbose_name="Hình thức thanh toán")
+    channel = models.CharField(max_length=10, choices=Channel.choices, verbose_name="Kênh")
+    order_count = models.IntegerField(default=0, verbose_name="Số hóa đơn")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Doanh thu")
+
+    def __str__(self):
+        return f"{self.day} {self.payment_method} {self.channel}: {self.revenue}"
+
+    class Meta:
+        verbose_name = "Doanh thu theo ngày"
+        verbose_name_plural = "Doanh thu theo ngày"
+        unique_together = ('day', 'payment_method', 'channel')
+
+
+class DishDailySales(models.Model):
+    day = models.DateField(verbose_name="Ngày")
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='daily_sales', verbose_name="Món ăn")
+    quantity = models.IntegerField(default=0, verbose_name="Số lượng")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Doanh thu")
+
+    def __str__(self):
+        return f"{self.day} {self.dish_id}: {self.quantity}"
+
+    class Meta:
+        verbose_name = "Doanh số món ăn theo ngày"
+        verbose_name_plural = "Doanh số món ăn theo ngày"
+        unique_together = ('day', 'dish')
+
+
 class Review(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews', verbose_name="Người dùng")
     dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='reviews', verbose_name="Món ăn")
@@ -138,7 +212,7 @@ class ReviewReply(BaseModel):
     content = models.TextField(verbose_name="Nội dung phản hồi")
 
     def __str__(self):
-        return f"Phản hồi của {self.user.username} cho đánh giá #{self.review.id}"
+        return f"Phản hồi của {self.user.username} cho đánh giá #{self.review_id}"
 
     class Meta:
         verbose_name = "Phản hồi Đánh giá"
@@ -186,6 +260,10 @@ class Booking(BaseModel):
         verbose_name = "Đơn Đặt Bàn"
         verbose_name_plural = "Các Đơn Đặt Bàn"
         ordering = ['-booking_time']
+        indexes = [
+            models.Index(fields=['status', 'booking_time'], name='booking_status_time_idx'),
+            models.Index(fields=['user', 'booking_time'], name='booking_user_time_idx'),
+        ]
 
 
 class BookingDetail(BaseModel):
@@ -201,3 +279,7 @@ class BookingDetail(BaseModel):
     class Meta:
         verbose_name = "Chi Tiết Đặt Bàn"
         verbose_name_plural = "Các Chi Tiết Đặt Bàn"
+        indexes = [
+            models.Index(fields=['table', 'start_time', 'end_time'], name='bookingdetail_table_time_idx'),
+            models.Index(fields=['start_time', 'end_time'], name='bookingdetail_time_idx'),
+        ]
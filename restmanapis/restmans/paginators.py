@@ -1,4 +1,111 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, Cursor
+from rest_framework.exceptions import NotFound
 
-class DishPagination(PageNumberPagination):
+
+class KeysetPagination(CursorPagination):
+    page_size = 20
+
+
+class DishPagination(KeysetPagination):
     page_size = 8
+    ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not isinstance(queryset, list):
+            return super().paginate_queryset(queryset, request, view)
+
+        # Danh sách đã lọc từ ảnh chụp thực đơn: con trỏ lưu vị trí trong danh sách,
+        # cắt trang trong bộ nhớ nên chi phí không phụ thuộc độ sâu.
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        try:
+            start = int(self.cursor.position) if self.cursor and self.cursor.position else 0
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if self.cursor and self.cursor.reverse:
+            start = max(start - self.page_size, 0)
+
+        end = start + self.page_size
+        self.page = queryset[start:end]
+        self.has_previous = start > 0
+        self.has_next = end < len(queryset)
+        self._list_bounds = (start, end)
+        self.display_page_controls = self.has_previous or self.has_next
+        return self.page
+
+    def get_next_link(self):
+        if not hasattr(self, '_list_bounds'):
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=str(self._list_bounds[1])))
+
+    def get_previous_link(self):
+        if not hasattr(self, '_list_bounds'):
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=str(self._list_bounds[0])))
+
+
+class ReviewPagination(KeysetPagination):
+    ordering = '-created_date'
+
+
+class OrderPagination(KeysetPagination):
+    ordering = '-created_date'
+
+
+class BookingPagination(KeysetPagination):
+    ordering = '-booking_time'
+
+
+def estimated_row_count(model):
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                           "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table])
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    # Danh sách không lọc trên bảng lớn: dùng số dòng ước lượng thay cho COUNT(*)
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(self.object_list.model)
+            if estimate is not None and estimate > self.estimate_threshold:
+                self.estimated = True
+                return estimate
+        return super().count
+
+    def page(self, number):
+        page = super().page(number)
+        if not getattr(self, 'estimated', False) or len(page.object_list) >= self.per_page:
+            return page
+        # Số ước lượng lệch cao (TABLE_ROWS của InnoDB): trang thiếu cho biết số dòng thật,
+        # trang rỗng thì đếm lại và trả về trang cuối thật thay vì trang trống
+        self.estimated = False
+        if page.object_list:
+            self.__dict__['count'] = (page.number - 1) * self.per_page + len(page.object_list)
+        else:
+            self.__dict__['count'] = super().count
+        self.__dict__.pop('num_pages', None)
+        return page if page.object_list else super().page(min(page.number, self.num_pages))
+
+    def get_elided_page_range(self, number=1, **kwargs):
+        # Trang quản trị vẫn giữ số trang đã yêu cầu dù trang đó đã bị kéo về trang cuối thật
+        return super().get_elided_page_range(min(int(number), self.num_pages), **kwargs)
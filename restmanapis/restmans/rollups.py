@@ -0,0 +1,119 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import F, Case, When, Value, Sum, Count, IntegerField, DecimalField
+from django.db import transaction
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import Order, OrderDetail, DailyRevenue, DishDailySales
+from . import caches
+
+COMPLETED = Order.OrderStatus.COMPLETED
+# Các cột quyết định nhóm và số tiền của hóa đơn trong bảng tổng hợp
+TRACKED_FIELDS = ('payment_method', 'total_amount', 'table_id')
+
+
+def channel_of(table_id):
+    return DailyRevenue.Channel.ONLINE if table_id is None else DailyRevenue.Channel.DINE_IN
+
+
+def apply_order(order_id, sign):
+    """Cộng (sign=1) hoặc trừ (sign=-1) một hóa đơn vào các bảng tổng hợp theo ngày tạo hóa đơn."""
+    order = Order.objects.filter(pk=order_id).values('created_date', 'payment_method', 'table_id', 'total_amount').first()
+    if order is None:
+        return
+    day = timezone.localdate(order['created_date'])
+    transaction.on_commit(lambda: caches.invalidate_stats('revenue', day.year))
+
+    key = {'day': day, 'payment_method': order['payment_method'], 'channel': channel_of(order['table_id'])}
+    DailyRevenue.objects.bulk_create([DailyRevenue(**key)], ignore_conflicts=True)
+    DailyRevenue.objects.filter(**key).update(order_count=F('order_count') + sign,
+                                              revenue=F('revenue') + sign * order['total_amount'])
+
+    _add_sales(day, OrderDetail.objects.filter(order_id=order_id).values_list('dish_id', 'quantity', 'unit_price'),
+               sign)
+
+
+def apply_lines(order_id, lines, sign):
+    """
+    Cộng/trừ các dòng [(dish_id, quantity, unit_price)] vào doanh số món nếu hóa đơn đã hoàn thành
+    (sửa chi tiết hóa đơn trực tiếp, vd. trong trang quản trị).
+    """
+    order = Order.objects.filter(pk=order_id, status=COMPLETED).values('created_date').first()
+    if order is None:
+        return
+    day = timezone.localdate(order['created_date'])
+    transaction.on_commit(lambda: caches.invalidate_stats('revenue', day.year))
+    _add_sales(day, lines, sign)
+
+
+def _add_sales(day, lines, sign):
+    sales = defaultdict(lambda: [0, Decimal(0)])
+    for dish_id, quantity, unit_price in lines:
+        sales[dish_id][0] += sign * quantity
+        sales[dish_id][1] += sign * quantity * unit_price
+    if not sales:
+        return
+    DishDailySales.objects.bulk_create([DishDailySales(day=day, dish_id=dish_id) for dish_id in sales],
+                                       ignore_conflicts=True)
+    DishDailySales.objects.filter(day=day, dish_id__in=sales).update(
+        quantity=F('quantity') + Case(*[When(dish_id=d, then=Value(q)) for d, (q, _) in sales.items()],
+                                      default=Value(0), output_field=IntegerField()),
+        revenue=F('revenue') + Case(*[When(dish_id=d, then=Value(r)) for d, (_, r) in sales.items()],
+                                    default=Value(0), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    )
+
+
+def tracked_values(instance):
+    # Đọc qua __dict__ để không nạp thêm các cột bị defer
+    return tuple(instance.__dict__.get(name) for name in TRACKED_FIELDS)
+
+
+def update_order(order_id, **fields):
+    """Ghi các cột không phải trạng thái; hóa đơn đã hoàn thành được chuyển từ nhóm cũ sang nhóm mới."""
+    names = {'table_id' if name == 'table' else name for name in fields}
+    with transaction.atomic():
+        status = Order.objects.select_for_update().filter(pk=order_id).values_list('status', flat=True).first()
+        moved = status == COMPLETED and bool(names & set(TRACKED_FIELDS))
+        if moved:
+            apply_order(order_id, -1)
+        Order.objects.filter(pk=order_id).update(updated_date=timezone.now(), **fields)
+        if moved:
+            apply_order(order_id, 1)
+
+
+def rebuild_rollups():
+    """Tính lại toàn bộ bảng tổng hợp từ lịch sử hóa đơn."""
+    completed = Order.objects.filter(status=COMPLETED)
+    DailyRevenue.objects.all().delete()
+    DishDailySales.objects.all().delete()
+
+    revenue = completed.annotate(day=TruncDate('created_date')).values('day', 'payment_method', 'table_id').annotate(
+        order_count=Count('id'), revenue=Sum('total_amount'))
+    rows = {}
+    for r in revenue:
+        key = (r['day'], r['payment_method'], channel_of(r['table_id']))
+        row = rows.setdefault(key, DailyRevenue(day=key[0], payment_method=key[1], channel=key[2]))
+        row.order_count += r['order_count']
+        row.revenue += r['revenue']
+    DailyRevenue.objects.bulk_create(rows.values(), batch_size=1000)
+
+    sales = OrderDetail.objects.filter(order__in=completed).annotate(day=TruncDate('order__created_date')).values(
+        'day', 'dish_id').annotate(total_quantity=Sum('quantity'), total_revenue=Sum(F('quantity') * F('unit_price')))
+    DishDailySales.objects.bulk_create([
+        DishDailySales(day=s['day'], dish_id=s['dish_id'], quantity=s['total_quantity'], revenue=s['total_revenue'])
+        for s in sales
+    ], batch_size=1000)
+    transaction.on_commit(lambda: caches.invalidate_stats('revenue'))
+    return len(rows)
+
+
+def revenue_by_month(year):
+    return list(DailyRevenue.objects.filter(day__year=year).annotate(month=TruncMonth('day')).values('month').annotate(
+        total=Sum('revenue')).order_by('month'))
+
+
+def revenue_by_day(start, end):
+    return list(DailyRevenue.objects.filter(day__range=(start, end)).values('day').annotate(
+        total=Sum('revenue')).order_by('day'))
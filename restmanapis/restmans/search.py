@@ -0,0 +1,83 @@
+import html
+import re
+import unicodedata
+from collections import Counter
+
+from django.db.models import Case, When, Sum, Max, F, Q, IntegerField
+
+from .models import Dish, SearchToken
+
+NAME_WEIGHT = 5
+CATEGORY_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+MAX_QUERY_TOKENS = 8
+TOKEN_MAX_LENGTH = 50
+
+_token_re = re.compile(r'[a-z0-9]+')
+_tag_re = re.compile(r'<[^>]*>')
+
+
+def fold(text):
+    # Bỏ dấu tiếng Việt: "Phở Bò" -> "pho bo"
+    text = (text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in text if unicodedata.category(c) != 'Mn').lower()
+
+
+def tokenize(text):
+    return [t[:TOKEN_MAX_LENGTH] for t in _token_re.findall(fold(text))]
+
+
+def plain_text(rich_text):
+    return html.unescape(_tag_re.sub(' ', rich_text or ''))
+
+
+def dish_tokens(name, category_name, description):
+    weights = Counter()
+    for token in tokenize(name):
+        weights[token] += NAME_WEIGHT
+    for token in tokenize(category_name):
+        weights[token] += CATEGORY_WEIGHT
+    for token in tokenize(plain_text(description)):
+        weights[token] += DESCRIPTION_WEIGHT
+    return weights
+
+
+def index_dish(dish):
+    SearchToken.objects.filter(dish=dish).delete()
+    if not dish.is_active:
+        return
+    weights = dish_tokens(dish.name, dish.category.name if dish.category else '', dish.description)
+    SearchToken.objects.bulk_create([SearchToken(token=t, dish=dish, weight=w) for t, w in weights.items()])
+
+
+def index_category(category):
+    for dish in Dish.objects.filter(category=category).select_related('category'):
+        index_dish(dish)
+
+
+def rebuild_index():
+    SearchToken.objects.all().delete()
+    for dish in Dish.objects.filter(is_active=True).select_related('category').iterator():
+        index_dish(dish)
+
+
+def search(q):
+    """Trả về id các món ăn khớp với mọi từ trong q, xếp theo độ liên quan."""
+    tokens = list(dict.fromkeys(tokenize(q)))[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return []
+
+    condition = Q()
+    for token in tokens:
+        condition |= Q(token__startswith=token)
+
+    # Khớp trọn từ được tính gấp đôi so với khớp tiền tố (gõ dở)
+    matched = {f'm{i}': Max(Case(When(token__startswith=t, then=1), default=0, output_field=IntegerField()))
+               for i, t in enumerate(tokens)}
+    score = Sum(Case(When(token__in=tokens, then=F('weight') * 2), default=F('weight'),
+                     output_field=IntegerField()))
+
+    return list(SearchToken.objects.filter(condition).values('dish_id').annotate(
+        score=score, **matched
+    ).filter(**{name: 1 for name in matched}).order_by('-score', '-dish_id').values_list('dish_id', flat=True))
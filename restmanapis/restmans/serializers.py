@@ -1,6 +1,8 @@
 from restmans.models import Category, Dish, Order, BookingDetail, Booking, OrderDetail, Table, Review, User, ReviewReply
 from rest_framework import serializers
 
+from restmans.image_utils import build_variants
+
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,7 +13,9 @@ class CategorySerializer(serializers.ModelSerializer):
 class ItemSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['image'] = instance.image.url
+        variants = instance.image_variants or build_variants(instance.image)
+        data['image'] = variants.get('full', '')
+        data['image_variants'] = variants
         return data
 
 
@@ -24,7 +28,9 @@ class DishSerializer(ItemSerializer):
 class UserSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['avatar'] = instance.avatar.url if instance.avatar else ''
+        variants = instance.avatar_variants or build_variants(instance.avatar)
+        data['avatar'] = variants.get('full', '')
+        data['avatar_variants'] = variants
         return data
     def create(self, validated_data):
         data = validated_data.copy()
@@ -85,8 +91,7 @@ class BookingSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'booking_time', 'number_of_guests', 'note', 'status', 'details']
         read_only_fields = ['status']
 
-class OrderDetailDishSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(use_url=True)
+class OrderDetailDishSerializer(ItemSerializer):
     class Meta:
         model = Dish
         fields = ['id', 'name', 'price', 'image']
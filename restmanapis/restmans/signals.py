@@ -0,0 +1,227 @@
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Category, Dish, Review, ReviewReply, Order, OrderDetail, Booking, BookingDetail, Table
+from . import caches, search, counters, availability, events, transitions, kitchen, rollups
+
+
+@receiver([post_save, post_delete], sender=Dish)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_menu(sender, **kwargs):
+    transaction.on_commit(caches.bump_menu_version)
+
+
+@receiver([post_save, post_delete], sender=Dish)
+def invalidate_dish_stats(sender, **kwargs):
+    # Thống kê món ăn hiển thị tên món và bỏ qua món đã xóa
+    transaction.on_commit(lambda: (caches.invalidate_stats('dishes'), caches.invalidate_stats('reviews')))
+
+
+@receiver(post_save, sender=Dish)
+def index_dish(sender, instance, **kwargs):
+    search.index_dish(instance)
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    search.index_category(instance)
+
+
+@receiver(post_init, sender=Review)
+def remember_review(sender, instance, **kwargs):
+    instance._counted = (instance.dish_id, instance.rating) if instance.pk else None
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, **kwargs):
+    counted = (instance.dish_id, instance.rating)
+    if instance._counted != counted:
+        if instance._counted:
+            counters.add_review_stats(instance._counted[0], -1, -instance._counted[1])
+        counters.add_review_stats(instance.dish_id, 1, instance.rating)
+        instance._counted = counted
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    if instance._counted:
+        counters.add_review_stats(instance._counted[0], -1, -instance._counted[1])
+        instance._counted = None
+
+
+@receiver(post_init, sender=OrderDetail)
+def remember_order_detail(sender, instance, **kwargs):
+    instance._counted = (instance.dish_id, instance.quantity) if instance.pk else None
+    instance._rolled_up = (instance.order_id, instance.dish_id, instance.quantity, instance.unit_price) \
+        if instance.pk else None
+
+
+@receiver(post_save, sender=OrderDetail)
+def count_order_detail(sender, instance, **kwargs):
+    counted = (instance.dish_id, instance.quantity)
+    if instance._counted != counted:
+        quantities = {instance.dish_id: instance.quantity}
+        if instance._counted:
+            dish_id, quantity = instance._counted
+            quantities[dish_id] = quantities.get(dish_id, 0) - quantity
+        counters.add_ordered_quantities(quantities)
+        instance._counted = counted
+
+
+@receiver(post_delete, sender=OrderDetail)
+def uncount_order_detail(sender, instance, **kwargs):
+    if instance._counted:
+        dish_id, quantity = instance._counted
+        counters.add_ordered_quantities({dish_id: -quantity})
+        instance._counted = None
+
+
+@receiver(post_save, sender=OrderDetail)
+def roll_up_order_detail(sender, instance, **kwargs):
+    # Sửa dòng của hóa đơn đã hoàn thành (trang quản trị): chuyển phần chênh lệch vào doanh số món
+    line = (instance.order_id, instance.dish_id, instance.quantity, instance.unit_price)
+    if instance._rolled_up != line:
+        if instance._rolled_up:
+            rollups.apply_lines(instance._rolled_up[0], [instance._rolled_up[1:]], -1)
+        rollups.apply_lines(instance.order_id, [line[1:]], 1)
+        instance._rolled_up = line
+
+
+@receiver(post_delete, sender=OrderDetail)
+def unroll_order_detail(sender, instance, origin=None, **kwargs):
+    # Xóa cả hóa đơn (hay món, người dùng) thì order_deleted đã trừ toàn bộ; ở đây chỉ trừ khi xóa riêng dòng
+    if instance._rolled_up and (isinstance(origin, OrderDetail) or getattr(origin, 'model', None) is OrderDetail):
+        rollups.apply_lines(instance._rolled_up[0], [instance._rolled_up[1:]], -1)
+        instance._rolled_up = None
+
+
+@receiver(post_save, sender=OrderDetail)
+@receiver(post_delete, sender=OrderDetail)
+def publish_kitchen_line(sender, instance, signal, **kwargs):
+    # Chỉ đẩy dòng của hóa đơn đang mở: xóa dây chuyền hóa đơn cũ/đã hoàn thành không được làm tràn luồng bếp
+    order = Order.objects.filter(pk=instance.order_id).values_list('table_id', 'status').first()
+    if order is None or order[1] not in kitchen.OPEN_STATUSES:
+        return
+    if OrderDetail.dish.is_cached(instance):
+        dish_name = instance.dish.name
+    else:
+        dish_name = Dish.objects.filter(pk=instance.dish_id).values_list('name', flat=True).first()
+    kitchen.publish_lines([{
+        'order_id': instance.order_id,
+        'table_id': order[0],
+        'dish_id': instance.dish_id,
+        'dish_name': dish_name,
+        'quantity': 0 if signal is post_delete else instance.quantity,
+    }])
+
+
+@receiver(transitions.status_changed, sender=Order)
+def order_transitioned(sender, pk, from_statuses, to_status, **kwargs):
+    kitchen.publish_order_status(pk, to_status)
+    if to_status == Order.OrderStatus.COMPLETED:
+        rollups.apply_order(pk, 1)
+    elif set(from_statuses) == {Order.OrderStatus.COMPLETED}:
+        # Chỉ chắc chắn hóa đơn rời khỏi COMPLETED khi đó là trạng thái nguồn duy nhất
+        rollups.apply_order(pk, -1)
+
+
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.status if instance.pk else None
+    instance._loaded_values = rollups.tracked_values(instance) if instance.pk else None
+
+
+@receiver(pre_save, sender=Order)
+def order_saving(sender, instance, **kwargs):
+    # Sửa trực tiếp bằng save() (trang quản trị): rút hóa đơn khỏi nhóm cũ khi rời COMPLETED hoặc đổi số liệu,
+    # lúc này dòng trong CSDL vẫn mang giá trị cũ
+    instance._rollup_removed = instance._loaded_status == Order.OrderStatus.COMPLETED and (
+        instance.status != Order.OrderStatus.COMPLETED or rollups.tracked_values(instance) != instance._loaded_values)
+    if instance._rollup_removed:
+        rollups.apply_order(instance.pk, -1)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    if instance.status == Order.OrderStatus.COMPLETED and (
+            instance._loaded_status != Order.OrderStatus.COMPLETED or instance._rollup_removed):
+        rollups.apply_order(instance.pk, 1)
+    if not created and instance._loaded_status != instance.status:
+        # Đổi trạng thái bằng save() (trang quản trị) không đi qua transitions nên phải tự báo cho bếp
+        kitchen.publish_order_status(instance.pk, instance.status)
+    instance._loaded_status = instance.status
+    instance._loaded_values = rollups.tracked_values(instance)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    if instance._loaded_status == Order.OrderStatus.COMPLETED:
+        rollups.apply_order(instance.pk, -1)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_review_page(sender, instance, **kwargs):
+    dish_id = instance.dish_id
+    transaction.on_commit(lambda: caches.invalidate_review_page(dish_id))
+
+
+@receiver([post_save, post_delete], sender=ReviewReply)
+def invalidate_reply_page(sender, instance, **kwargs):
+    dish_id = Review.objects.filter(pk=instance.review_id).values_list('dish_id', flat=True).first()
+    if dish_id:
+        transaction.on_commit(lambda: caches.invalidate_review_page(dish_id))
+
+
+@receiver(post_init, sender=BookingDetail)
+def remember_booking_detail(sender, instance, **kwargs):
+    instance._interval = (instance.start_time, instance.end_time)
+
+
+@receiver([post_save, post_delete], sender=BookingDetail)
+def invalidate_availability(sender, instance, **kwargs):
+    intervals = [instance._interval, (instance.start_time, instance.end_time)]
+    instance._interval = intervals[-1]
+    transaction.on_commit(lambda: availability.invalidate(intervals))
+
+
+@receiver(post_init, sender=Booking)
+def remember_booking_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.status
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_booking_availability(sender, instance, created, **kwargs):
+    if not created and instance._loaded_status != instance.status:
+        intervals = list(instance.details.values_list('start_time', 'end_time'))
+        transaction.on_commit(lambda: availability.invalidate(intervals))
+    instance._loaded_status = instance.status
+
+
+@receiver(transitions.status_changed, sender=Booking)
+def booking_transitioned(sender, pk, from_statuses, to_status, **kwargs):
+    # Chỉ việc hủy (hoặc khôi phục đơn đã hủy) mới làm thay đổi lịch trống của bàn
+    if Booking.BookingStatus.CANCELLED in (to_status, *from_statuses):
+        intervals = list(BookingDetail.objects.filter(booking_id=pk).values_list('start_time', 'end_time'))
+        transaction.on_commit(lambda: availability.invalidate(intervals))
+
+
+@receiver(post_init, sender=Table)
+def remember_table_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.status
+
+
+@receiver(post_save, sender=Table)
+def table_status_changed(sender, instance, created, **kwargs):
+    old_status = None if created else instance._loaded_status
+    if old_status != instance.status:
+        events.publish_tables([instance])
+        delta = (instance.status == Table.TableStatus.AVAILABLE) - (old_status == Table.TableStatus.AVAILABLE)
+        transaction.on_commit(lambda: caches.adjust_free_table_count(delta))
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Table)
+def table_deleted(sender, instance, **kwargs):
+    if instance._loaded_status == Table.TableStatus.AVAILABLE:
+        transaction.on_commit(lambda: caches.adjust_free_table_count(-1))
@@ -1,3 +1,828 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import threading
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import brotli
+import msgpack
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import User, Category, Dish, Order, OrderDetail, DailyRevenue, DishDailySales, Review, ReviewReply, Table, Booking, BookingDetail
+from . import rollups, transitions, availability, assignment, search, counters, caches, events, exports
+from .paginators import EstimatedCountPaginator
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create(username='manager', role=User.Role.MANAGER)
+        self.dish = Dish.objects.create(name='Lẩu', price=70, image='x')
+        self.order = Order.objects.create(user=self.manager, total_amount=140)
+        OrderDetail.objects.create(order=self.order, dish=self.dish, quantity=2)
+        transitions.transition(Order, self.order.pk, [Order.OrderStatus.PENDING], Order.OrderStatus.COMPLETED)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def buckets(self):
+        return {row.payment_method: (row.order_count, row.revenue)
+                for row in DailyRevenue.objects.exclude(order_count=0)}
+
+    def test_completed_order_counted_once(self):
+        self.assertEqual(self.buckets(), {'CASH': (1, Decimal('140.00'))})
+        self.assertEqual(DishDailySales.objects.get(dish=self.dish).quantity, 2)
+
+    def test_same_status_is_not_a_transition(self):
+        with self.assertRaises(ValueError):
+            transitions.transition(Order, self.order.pk, [Order.OrderStatus.COMPLETED], Order.OrderStatus.COMPLETED)
+
+    def test_update_payment_method_of_completed_order(self):
+        # Form quản lý luôn gửi lại trạng thái hiện tại cùng với hình thức thanh toán
+        response = self.client.patch(f'/orders/{self.order.pk}/update-order/',
+                                     {'status': 'COMPLETED', 'payment_method': 'VNPAY'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.buckets(), {'VNPAY': (1, Decimal('140.00'))})
+        self.assertEqual(DishDailySales.objects.get(dish=self.dish).quantity, 2)
+        revenue = self.client.get('/stats/revenue/').data
+        self.assertEqual([Decimal(row['total']) for row in revenue], [Decimal('140.00')])
+
+    def test_leave_completed_with_field_change(self):
+        self.client.patch(f'/orders/{self.order.pk}/update-order/',
+                          {'status': 'CANCELLED', 'payment_method': 'MOMO'}, format='json')
+        self.assertEqual(self.buckets(), {})
+        self.assertEqual(DishDailySales.objects.get(dish=self.dish).quantity, 0)
+
+    def test_admin_save_moves_amount(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.total_amount = 100
+        order.payment_method = Order.PaymentMethod.MOMO
+        order.save()
+        self.assertEqual(self.buckets(), {'MOMO': (1, Decimal('100.00'))})
+        order.save()
+        self.assertEqual(self.buckets(), {'MOMO': (1, Decimal('100.00'))})
+        order.delete()
+        self.assertEqual(self.buckets(), {})
+
+    def test_apply_order_adds_and_subtracts(self):
+        other = Order.objects.create(user=self.manager, total_amount=35, payment_method=Order.PaymentMethod.MOMO)
+        OrderDetail.objects.create(order=other, dish=self.dish, quantity=1)
+        rollups.apply_order(other.pk, 1)
+        self.assertEqual(self.buckets(), {'CASH': (1, Decimal('140.00')), 'MOMO': (1, Decimal('35.00'))})
+        sales = DishDailySales.objects.get(dish=self.dish)
+        self.assertEqual((sales.quantity, sales.revenue), (3, Decimal('210.00')))
+        rollups.apply_order(other.pk, -1)
+        rollups.apply_order(0, 1)
+        self.assertEqual(self.buckets(), {'CASH': (1, Decimal('140.00'))})
+        sales.refresh_from_db()
+        self.assertEqual((sales.quantity, sales.revenue), (2, Decimal('140.00')))
+
+    def test_admin_line_edits_move_dish_sales(self):
+        other = Dish.objects.create(name='Trà', price=10, image='x')
+        line = OrderDetail.objects.get(order=self.order)
+        line.quantity = 3
+        line.save()
+        OrderDetail.objects.create(order=self.order, dish=other, quantity=4)
+        sales = dict(DishDailySales.objects.values_list('dish__name', 'quantity'))
+        self.assertEqual(sales, {'Lẩu': 3, 'Trà': 4})
+        self.assertEqual(DishDailySales.objects.get(dish=self.dish).revenue, Decimal('210.00'))
+        OrderDetail.objects.get(order=self.order, dish=other).delete()
+        self.assertEqual(DishDailySales.objects.get(dish=other).quantity, 0)
+        # Xóa cả hóa đơn chỉ trừ một lần
+        Order.objects.get(pk=self.order.pk).delete()
+        self.assertEqual(dict(DishDailySales.objects.values_list('dish__name', 'quantity')), {'Lẩu': 0, 'Trà': 0})
+
+    def test_lines_of_open_orders_not_rolled_up(self):
+        pending = Order.objects.create(user=self.manager, total_amount=70)
+        OrderDetail.objects.create(order=pending, dish=self.dish, quantity=1)
+        self.assertEqual(DishDailySales.objects.get(dish=self.dish).quantity, 2)
+
+    def test_rebuild_matches_incremental(self):
+        other = Order.objects.create(user=self.manager, total_amount=35, table=None)
+        OrderDetail.objects.create(order=other, dish=self.dish, quantity=1)
+        rollups.apply_order(other.pk, 1)
+        Order.objects.filter(pk=other.pk).update(status=Order.OrderStatus.COMPLETED)
+        incremental = self.buckets()
+        rollups.rebuild_rollups()
+        self.assertEqual(self.buckets(), incremental)
+        self.assertEqual(DishDailySales.objects.aggregate(total=Sum('quantity'))['total'], 3)
+
+
+class ModerateReviewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        dish = Dish.objects.create(name='Phở', price=50, image='x')
+        self.ids = [Review.objects.create(user=User.objects.create(username=f'khach{i}'), dish=dish, rating=5,
+                                          content='Ngon').id for i in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='waiter', role=User.Role.WAITER))
+
+    def moderate(self, ids):
+        return self.client.post('/reviews/moderate/', {'action': 'hide', 'ids': ids}, format='json')
+
+    def test_ids_must_be_a_list(self):
+        for ids in [str(self.ids[0]), self.ids[0], {'id': self.ids[0]}, None, [True]]:
+            self.assertEqual(self.moderate(ids).status_code, 400, ids)
+        self.assertEqual(Review.objects.filter(is_active=True).count(), 3)
+
+    def test_ids_length_is_capped(self):
+        self.assertEqual(self.moderate(list(range(1, 502))).status_code, 400)
+
+    def test_hide(self):
+        response = self.moderate(self.ids[:2] + [999])
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['missing'], [999])
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.day = date(2026, 5, 4)
+        self.table = Table.objects.create(table_number='1', capacity=4)
+        self.booking = Booking.objects.create(user=User.objects.create(username='khach'),
+                                              booking_time=timezone.now(), number_of_guests=2)
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime(2026, 5, 4, hour, minute))
+
+    def book(self, start, end):
+        with self.captureOnCommitCallbacks(execute=True):
+            return BookingDetail.objects.create(booking=self.booking, table=self.table, start_time=start, end_time=end)
+
+    def test_late_stale_write_is_dead(self):
+        key = availability._bitmap_key(self.day)
+        detail = self.book(self.at(18), self.at(20))
+        # Người đọc đã truy vấn trước khi đơn commit, ghi vào cache sau khi đã xóa
+        cache.set(key, {}, availability.BITMAP_TIMEOUT)
+        self.assertEqual(availability.busy_table_ids(self.at(19), self.at(19, 30)), {self.table.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            detail.delete()
+        self.assertEqual(availability.busy_table_ids(self.at(19), self.at(19, 30)), set())
+
+    def test_mask_rounds_outwards(self):
+        slot = 7 * 60 // availability.SLOT_MINUTES
+        self.assertEqual(availability._mask(self.at(7), self.at(7, 5), self.day), 1 << slot)
+        self.assertEqual(availability._mask(self.at(7, 2), self.at(7, 7), self.day), 0b11 << slot)
+        self.assertEqual(availability._mask(self.at(7), self.at(7), self.day), 0)
+        # Khoảng vắt qua ngày chỉ lấy phần thuộc ngày đang xét
+        self.assertEqual(availability._mask(self.at(0) - timedelta(hours=1), self.at(0, 10), self.day), 0b11)
+        self.assertEqual(availability._mask(self.at(23, 55), self.at(23, 55) + timedelta(hours=1), self.day),
+                         1 << (availability.SLOTS_PER_DAY - 1))
+
+    def test_day_grid_lists_busy_tables(self):
+        other = Table.objects.create(table_number='2', capacity=2)
+        self.book(self.at(18, 10), self.at(19))
+        self.book(self.at(6), self.at(8, 30))
+        BookingDetail.objects.create(booking=self.booking, table=other, start_time=self.at(12), end_time=self.at(13))
+        grid = availability.day_grid(self.day, 60, [self.table.id])
+        self.assertEqual(len(grid), availability.CLOSING_HOUR - availability.OPENING_HOUR)
+        busy = {start.hour: tables for start, end, tables in grid}
+        self.assertEqual(busy[7], [self.table.id])
+        self.assertEqual(busy[8], [self.table.id])
+        self.assertEqual(busy[9], [])
+        self.assertEqual(busy[12], [])
+        self.assertEqual(busy[18], [self.table.id])
+        self.assertEqual(busy[19], [])
+
+
+class AssignmentTests(TestCase):
+    def tables(self, *capacities):
+        return [SimpleNamespace(id=i, capacity=c) for i, c in enumerate(capacities, 1)]
+
+    def booking(self, id, guests, hour=18):
+        return SimpleNamespace(id=id, number_of_guests=guests,
+                               booking_time=timezone.make_aware(datetime(2026, 5, 4, hour)))
+
+    def test_best_tables_prefers_fewest_wasted_seats_then_fewest_tables(self):
+        two, four, six = self.tables(2, 4, 6)
+        self.assertEqual(assignment.best_tables([two, four, six], 5), (six,))
+        self.assertEqual(assignment.best_tables([two, four, six], 3), (four,))
+        self.assertEqual(assignment.best_tables([two, four, six], 7), (two, six))
+        self.assertIsNone(assignment.best_tables([two, four], 7))
+
+    def test_solve_seats_larger_parties_first(self):
+        two, four = self.tables(2, 4)
+        proposal, unassigned = assignment.solve([self.booking(1, 2), self.booking(2, 4), self.booking(3, 1)],
+                                                [two, four], {})
+        self.assertEqual(proposal, {2: [four], 1: [two]})
+        self.assertEqual(unassigned, [3])
+
+    def test_solve_skips_busy_tables(self):
+        two, four = self.tables(2, 4)
+        start, end = assignment.booking_interval(self.booking(0, 0, hour=17))
+        proposal, unassigned = assignment.solve([self.booking(1, 2), self.booking(2, 2, hour=21)], [two, four],
+                                                {two.id: [(start, end)]})
+        self.assertEqual(proposal, {1: [four], 2: [two]})
+        self.assertEqual(unassigned, [])
+
+
+class AssignDetailsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='khach', email='khach@example.com')
+        self.tables = [Table.objects.create(table_number=str(i), capacity=4) for i in (1, 2)]
+        self.bookings = [Booking.objects.create(user=user, booking_time=self.at(hour), number_of_guests=3)
+                         for hour in (18, 19)]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='quanly', role=User.Role.MANAGER))
+
+    def at(self, hour):
+        return timezone.make_aware(datetime(2026, 5, 10, hour))
+
+    def assign(self, booking, *details):
+        return self.client.post(f'/bookings/{booking.id}/assign-details/', {'details': [
+            {'table_id': table.id, 'start_time': self.at(hour).isoformat(), 'end_time': self.at(hour + 2).isoformat()}
+            for table, hour in details]}, format='json')
+
+    def test_overlaps_rejected_with_conflict(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.assign(self.bookings[0], (self.tables[0], 18)).status_code, 200)
+        # Trùng với đơn đã xếp và trùng nhau trong cùng yêu cầu
+        self.assertEqual(self.assign(self.bookings[1], (self.tables[0], 19)).status_code, 409)
+        self.assertEqual(self.assign(self.bookings[1], (self.tables[1], 19), (self.tables[1], 20)).status_code, 409)
+        self.assertFalse(BookingDetail.objects.filter(booking=self.bookings[1]).exists())
+        response = self.assign(self.bookings[1], (self.tables[1], 19))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], Booking.BookingStatus.CONFIRMED)
+
+
+class BookingListTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create(username='quanly', role=User.Role.MANAGER)
+        self.customer = User.objects.create(username='khach')
+        table = Table.objects.create(table_number='1', capacity=4)
+        base = timezone.make_aware(datetime(2026, 11, 1, 12))
+        for i in range(30):
+            booking = Booking.objects.create(user=self.customer, booking_time=base + timedelta(days=i),
+                                             number_of_guests=2, status='PENDING' if i % 2 else 'CONFIRMED')
+            BookingDetail.objects.create(booking=booking, table=table, start_time=booking.booking_time,
+                                         end_time=booking.booking_time + timedelta(hours=2))
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_filters_and_prefetching(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/bookings/')
+        self.assertEqual(len(response.data['results']), 20)
+        response = self.client.get('/bookings/', {'from': '2026-11-05', 'to': '2026-11-10', 'status': 'pending'})
+        self.assertEqual([b['booking_time'][:10] for b in response.data['results']],
+                         ['2026-11-10', '2026-11-08', '2026-11-06'])
+        self.assertEqual(self.client.get('/bookings/', {'from': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/bookings/', {'status': 'NOPE'}).data, {'error': 'Trạng thái không hợp lệ.'})
+        with self.assertNumQueries(3):
+            response = self.client.get('/bookings/pending/')
+        self.assertEqual(len(response.data['results']), 15)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(len(self.client.get('/bookings/', {'status': 'CONFIRMED'}).data['results']), 15)
+
+
+class FreeTableCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tables = [Table.objects.create(table_number=str(i), capacity=4) for i in (1, 2)]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='khach'))
+
+    def book(self):
+        booking_time = (timezone.now() + timedelta(days=3)).isoformat()
+        return self.client.post('/bookings/', {'booking_time': booking_time, 'number_of_guests': 2}, format='json')
+
+    def test_counter_follows_table_status(self):
+        self.assertEqual(caches.free_table_count(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            events.set_table_status([table.id for table in self.tables], Table.TableStatus.OCCUPIED)
+        self.assertEqual(caches.free_table_count(), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.book().status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            table = Table.objects.get(pk=self.tables[0].pk)
+            table.status = Table.TableStatus.AVAILABLE
+            table.save()
+            Table.objects.get(pk=self.tables[1].pk).delete()
+        self.assertEqual(caches.free_table_count(), 1)
+        self.assertEqual(self.book().status_code, 201)
+
+
+class OrderCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dishes = [Dish.objects.create(name=f'Món {i}', price=10 + i, image='x') for i in range(20)]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='khach'))
+
+    def order(self, cart):
+        return self.client.post('/orders/', {'cart': cart, 'payment_method': 'CASH'}, format='json')
+
+    def test_cart_created_in_batches(self):
+        cart = [{'dish_id': dish.id, 'quantity': 2} for dish in self.dishes]
+        cart.append({'dish_id': self.dishes[0].id, 'quantity': 1})
+        with self.assertNumQueries(9):
+            response = self.order(cart)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['details']), 20)
+        self.assertEqual(Decimal(response.data['total_amount']), sum((10 + i) * 2 for i in range(20)) + 10)
+        self.assertEqual(Dish.objects.get(pk=self.dishes[0].pk).ordered_quantity, 3)
+
+    def test_invalid_cart_rejected(self):
+        hidden = Dish.objects.create(name='Món ẩn', price=1, image='x', is_active=False)
+        dish_id = self.dishes[0].id
+        for cart in ([{'dish_id': hidden.id, 'quantity': 1}], [{'dish_id': dish_id, 'quantity': 0}],
+                     [{'dish_id': dish_id}], [{'dish_id': 'x', 'quantity': 1}], {'dish_id': dish_id}):
+            self.assertEqual(self.order(cart).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class TableOrderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.table = Table.objects.create(table_number='1', capacity=4)
+        self.pho = Dish.objects.create(name='Phở', price=10, image='x')
+        self.tea = Dish.objects.create(name='Trà', price=5, image='x')
+        self.client = APIClient()
+
+    def order(self, table_id, *lines):
+        return self.client.post('/orders/place-order-at-table/', {'table_id': table_id, 'cart': [
+            {'dish_id': dish_id, 'quantity': quantity} for dish_id, quantity in lines]}, format='json')
+
+    def test_lines_merged_into_pending_order(self):
+        self.assertEqual(self.order(self.table.id, (self.pho.id, 2)).status_code, 201)
+        response = self.order(self.table.id, (self.pho.id, 1), (self.tea.id, 3))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Decimal(response.data['total_amount']), 45)
+        self.assertEqual({line['dish']['id']: line['quantity'] for line in response.data['details']},
+                         {self.pho.id: 3, self.tea.id: 3})
+        self.assertEqual(Table.objects.get(pk=self.table.pk).status, Table.TableStatus.OCCUPIED)
+        self.assertEqual(self.order(999, (self.pho.id, 1)).status_code, 404)
+        self.assertEqual(self.order(self.table.id, (999, 1)).status_code, 400)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentTableOrderTests(TransactionTestCase):
+    def test_concurrent_phones_share_one_order(self):
+        table = Table.objects.create(table_number='1', capacity=4)
+        dish = Dish.objects.create(name='Phở', price=10, image='x')
+        barrier = threading.Barrier(4)
+        responses = []
+
+        def place():
+            try:
+                barrier.wait()
+                responses.append(APIClient().post('/orders/place-order-at-table/', {
+                    'table_id': table.id, 'cart': [{'dish_id': dish.id, 'quantity': 1}]}, format='json'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=place) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([response.status_code for response in responses], [201] * 4)
+        order = Order.objects.get(table=table)
+        self.assertEqual(order.total_amount, 40)
+        self.assertEqual(OrderDetail.objects.get(order=order).quantity, 4)
+
+
+class OrderListTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create(username='quanly', role=User.Role.MANAGER)
+        self.customer = User.objects.create(username='khach')
+        table = Table.objects.create(table_number='1', capacity=4)
+        dishes = [Dish.objects.create(name=f'Món {i}', price=10, image='x') for i in range(3)]
+        for i in range(25):
+            order = Order.objects.create(user=self.customer if i % 2 else None, table=None if i % 2 else table,
+                                         status='PAID' if i % 3 == 0 else 'PENDING')
+            OrderDetail.objects.bulk_create([OrderDetail(order=order, dish=dish, quantity=1, unit_price=10)
+                                             for dish in dishes])
+        self.client = APIClient()
+
+    def test_manager_and_customer_listings(self):
+        self.client.force_authenticate(self.manager)
+        with self.assertNumQueries(3):
+            response = self.client.get('/orders/')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(response.data['results'][0]['details']), 3)
+        self.assertEqual(len(self.client.get('/orders/', {'status': 'PAID'}).data['results']), 9)
+        self.assertEqual(self.client.get('/orders/', {'status': 'X'}).status_code, 400)
+        self.assertEqual(self.client.get('/orders/', {'from': '2000-01-01', 'to': '2001-01-01'}).data['results'], [])
+        self.client.force_authenticate(self.customer)
+        with self.assertNumQueries(3):
+            response = self.client.get('/orders/')
+        self.assertEqual(len(response.data['results']), 12)
+
+
+class TransitionTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='khach')
+        self.client = APIClient()
+
+    def test_only_one_transition_wins(self):
+        order = Order.objects.create(user=self.customer)
+        stale = Order.objects.get(pk=order.pk)
+        self.assertTrue(transitions.apply(order, ['PENDING'], 'PAID', payment_method='MOMO'))
+        self.assertFalse(transitions.apply(stale, ['PENDING'], 'CANCELLED'))
+        self.assertEqual(Order.objects.values_list('status', 'payment_method').get(), ('PAID', 'MOMO'))
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.patch(f'/orders/{order.id}/cancel/').status_code, 400)
+        self.assertEqual(self.client.patch(f'/orders/{order.id}/confirm/').status_code, 400)
+        self.client.patch(f'/orders/{order.id}/update-order/', {'status': 'SHIPPING'}, format='json')
+        self.assertEqual(self.client.patch(f'/orders/{order.id}/confirm/').data['status'], 'COMPLETED')
+
+    def test_payment_notifications_are_idempotent(self):
+        momo, vnpay = Order.objects.create(user=self.customer), Order.objects.create(user=self.customer)
+        self.assertEqual(self.client.post('/momo/', {'resultCode': 0, 'orderId': f'{momo.id}_abc'},
+                                          format='json').status_code, 204)
+        self.assertEqual(Order.objects.get(pk=momo.pk).payment_method, 'MOMO')
+        with mock.patch('restmans.views.Vnpay.validate_response', return_value=True):
+            for code in ('00', '00', '24'):
+                response = self.client.get('/vnpay/', {'vnp_ResponseCode': code, 'vnp_TxnRef': f'{vnpay.id}_x'})
+                self.assertEqual(response.data['RspCode'], '00')
+            self.assertEqual(Order.objects.get(pk=vnpay.pk).status, 'PAID')
+            response = self.client.get('/vnpay/', {'vnp_ResponseCode': '00', 'vnp_TxnRef': '9999_x'})
+            self.assertEqual(response.data['RspCode'], '01')
+
+    def test_booking_completed_once(self):
+        table = Table.objects.create(table_number='1', capacity=4)
+        start = timezone.make_aware(datetime(2026, 11, 10, 10))
+        booking = Booking.objects.create(user=self.customer, booking_time=start, number_of_guests=2,
+                                         status=Booking.BookingStatus.CONFIRMED)
+        BookingDetail.objects.create(booking=booking, table=table, start_time=start,
+                                     end_time=start + timedelta(hours=2))
+        self.client.force_authenticate(User.objects.create(username='quanly', role=User.Role.MANAGER))
+        self.assertEqual(self.client.patch(f'/bookings/{booking.id}/complete/').data['status'], 'COMPLETED')
+        self.assertEqual(Table.objects.get(pk=table.pk).status, Table.TableStatus.CLEANING)
+        self.assertEqual(self.client.patch(f'/bookings/{booking.id}/complete/').status_code, 400)
+
+
+class StatsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create(username='khach')
+        self.dish = Dish.objects.create(name='Phở', price=10, image='x')
+        old = Order.objects.create(user=self.customer, total_amount=7, status=Order.OrderStatus.COMPLETED)
+        Order.objects.filter(pk=old.pk).update(created_date=timezone.make_aware(datetime(2020, 3, 5, 12)))
+        rollups.rebuild_rollups()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='quanly', role=User.Role.MANAGER))
+
+    def test_closed_year_served_from_cache(self):
+        self.assertEqual(len(self.client.get('/stats/revenue/?year=2020').data), 1)
+        with self.assertNumQueries(0):
+            self.client.get('/stats/revenue/?year=2020')
+        self.assertEqual(str(self.client.get('/stats/revenue/?year=2020&month=3').data[0]['day']), '2020-03-05')
+        self.assertEqual(self.client.get('/stats/revenue/?month=13').status_code, 400)
+        self.assertEqual(self.client.get('/stats/revenue/?from=2020-02-01&to=2020-01-01').status_code, 400)
+
+    def test_writes_invalidate_their_buckets(self):
+        self.client.get('/stats/revenue/?year=2020')
+        self.assertEqual(self.client.get('/stats/revenue/').data, [])
+        order = Order.objects.create(user=self.customer, total_amount=20)
+        OrderDetail.objects.create(order=order, dish=self.dish, quantity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            transitions.transition(Order, order.id, ['PENDING'], 'COMPLETED')
+        self.assertEqual(len(self.client.get('/stats/revenue/').data), 1)
+        with self.assertNumQueries(0):
+            self.client.get('/stats/revenue/?year=2020')
+        self.assertEqual(self.client.get('/stats/dish-popularity/').data[0]['order_count'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            line = OrderDetail.objects.get(order=order)
+            line.quantity = 3
+            line.save()
+        self.assertEqual(self.client.get('/stats/dish-popularity/').data[0]['order_count'], 3)
+
+
+class SalesCubeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create(username='khach')
+        self.category = Category.objects.create(name='Lẩu')
+        self.hotpot = Dish.objects.create(name='Lẩu thái', price=10, image='x', category=self.category)
+        self.tea = Dish.objects.create(name='Trà', price=5, image='x')
+        self.table = Table.objects.create(table_number='1', capacity=4)
+        self.completed(datetime(2025, 6, 2, 12, 30), self.table, 'CASH', (self.hotpot, 1))
+        self.completed(datetime(2025, 6, 2, 19), self.table, 'MOMO', (self.hotpot, 2), (self.tea, 1))
+        self.completed(datetime(2025, 6, 8, 19, 5), None, 'VNPAY', (self.tea, 2))
+        self.completed(datetime(2024, 6, 8, 19, 5), self.table, 'CASH', (self.hotpot, 1))
+        booking = Booking.objects.create(user=self.customer, booking_time=timezone.make_aware(datetime(2025, 6, 2, 19)),
+                                         number_of_guests=3, status=Booking.BookingStatus.COMPLETED)
+        BookingDetail.objects.create(booking=booking, table=self.table, start_time=booking.booking_time,
+                                     end_time=booking.booking_time + timedelta(hours=2))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='quanly', role=User.Role.MANAGER))
+
+    def completed(self, when, table, payment_method, *lines):
+        order = Order.objects.create(user=self.customer, table=table, payment_method=payment_method,
+                                     total_amount=sum(dish.price * quantity for dish, quantity in lines))
+        for dish, quantity in lines:
+            OrderDetail.objects.create(order=order, dish=dish, quantity=quantity)
+        Order.objects.filter(pk=order.pk).update(created_date=timezone.make_aware(when))
+        transitions.transition(Order, order.id, ['PENDING'], 'COMPLETED')
+
+    def test_all_dimensions(self):
+        with self.assertNumQueries(6):
+            data = self.client.get('/stats/cube/?from=2025-01-01&to=2025-12-31').data
+        self.assertEqual(data['hour'][19], {'hour': 19, 'revenue': 35.0, 'orders': 2, 'covers': 3})
+        self.assertEqual(data['weekday'][0], {'weekday': 1, 'revenue': 35.0, 'orders': 2, 'covers': 3})
+        self.assertEqual({row['payment_method']: row['revenue'] for row in data['payment_method']},
+                         {'CASH': 10.0, 'MOMO': 25.0, 'VNPAY': 10.0})
+        tables = {row['table_id']: row for row in data['table']}
+        self.assertEqual(tables[self.table.id], {'table_id': self.table.id, 'table_number': '1', 'revenue': 35.0,
+                                                 'orders': 2, 'covers': 3})
+        self.assertEqual(tables[None]['revenue'], 10.0)
+        categories = {row['name']: row for row in data['category']}
+        self.assertEqual(categories['Lẩu'], {'category_id': self.category.id, 'name': 'Lẩu', 'revenue': 30.0,
+                                             'quantity': 3})
+        self.assertEqual(categories['Món khác']['quantity'], 3)
+
+    def test_rollup_dimensions_and_errors(self):
+        with self.assertNumQueries(2):
+            data = self.client.get('/stats/cube/?from=2025-01-01&to=2025-12-31&dimensions=payment_method,weekday').data
+        self.assertEqual(data['weekday'][6]['revenue'], 10.0)
+        self.assertEqual(self.client.get('/stats/cube/?dimensions=foo').status_code, 400)
+        self.assertEqual(self.client.get('/stats/cube/?from=2025-13-01').status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        customer = User.objects.create(username='khách')
+        pho = Dish.objects.create(name='Phở <bò> & "gà"', price=10, image='x')
+        tea = Dish.objects.create(name='Trà', price=5, image='x')
+        table = Table.objects.create(table_number='T1', capacity=4)
+        order = Order.objects.create(user=customer, table=table, total_amount=25, status='COMPLETED', note='a,b\nc')
+        OrderDetail.objects.create(order=order, dish=pho, quantity=2)
+        OrderDetail.objects.create(order=order, dish=tea, quantity=1)
+        old = Order.objects.create(user=customer, total_amount=5, status='CANCELLED')
+        OrderDetail.objects.create(order=old, dish=tea, quantity=1)
+        Order.objects.filter(pk=old.pk).update(created_date=timezone.make_aware(datetime(2020, 1, 1, 12)))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='quanly', role=User.Role.MANAGER))
+
+    def download(self, url):
+        return b''.join(self.client.get(url).streaming_content)
+
+    def csv_rows(self, url):
+        return list(csv.reader(io.StringIO(self.download(url).decode('utf-8-sig'))))
+
+    def test_csv(self):
+        rows = self.csv_rows('/orders/export/')
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0][0], 'Mã hóa đơn')
+        self.assertEqual((rows[1][4], rows[1][8]), ('T1', 'a,b\nc'))
+        self.assertEqual(len(self.csv_rows('/orders/export/?status=COMPLETED')), 2)
+        rows = self.csv_rows('/orders/export-lines/?from=2020-01-01&to=2020-01-01')
+        self.assertEqual((rows[1][6], rows[1][-1]), ('Trà', '5.00'))
+        self.assertEqual(self.client.get('/orders/export/?file_type=pdf').status_code, 400)
+
+    def test_xlsx(self):
+        archive = zipfile.ZipFile(io.BytesIO(self.download('/orders/export-lines/?file_type=xlsx&status=COMPLETED')))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 3)
+        self.assertIn('Phở &lt;bò&gt; &amp; "gà"', sheet)
+        self.assertIn('<c><v>20.00</v></c></row>', sheet)
+
+    def test_rows_read_in_chunks(self):
+        Order.objects.bulk_create([Order(total_amount=1) for _ in range(1000)])
+        rows = exports.iter_rows(Order.objects.all(), exports.ORDER_COLUMNS, chunk_size=300)
+        with self.assertNumQueries(4):
+            self.assertEqual(sum(1 for _ in rows), 1002)
+
+
+class SearchTokenTests(TestCase):
+    def test_fold(self):
+        self.assertEqual(search.fold('Phở Bò ĐẶC BIỆT'), 'pho bo dac biet')
+        self.assertEqual(search.fold('Đậu hũ'), 'dau hu')
+        self.assertEqual(search.fold(None), '')
+
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize('Gà rán (cay) 100%, cơm-chiên'), ['ga', 'ran', 'cay', '100', 'com', 'chien'])
+        self.assertEqual(search.tokenize('a' * 80), ['a' * search.TOKEN_MAX_LENGTH])
+        self.assertEqual(search.tokenize('  ...  '), [])
+
+
+class KitchenLineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dish = Dish.objects.create(name='Cơm', price=30, image='x')
+        self.order = Order.objects.create(total_amount=60)
+
+    def test_open_order_line_published(self):
+        with mock.patch('restmans.kitchen.publish_lines') as publish, self.assertNumQueries(4):
+            OrderDetail.objects.create(order=self.order, dish=self.dish, quantity=2)
+        self.assertEqual(publish.call_args.args[0], [{'order_id': self.order.id, 'table_id': None,
+                                                      'dish_id': self.dish.id, 'dish_name': 'Cơm', 'quantity': 2}])
+
+    def test_deleting_closed_order_publishes_nothing(self):
+        OrderDetail.objects.create(order=self.order, dish=self.dish, quantity=2)
+        Order.objects.filter(pk=self.order.pk).update(status=Order.OrderStatus.CANCELLED)
+        with mock.patch('restmans.kitchen.publish_lines') as publish:
+            Order.objects.get(pk=self.order.pk).delete()
+        publish.assert_not_called()
+
+    def test_admin_status_change_published(self):
+        order = Order.objects.get(pk=self.order.pk)
+        with mock.patch('restmans.kitchen.publish_order_status') as publish:
+            order.save()
+            order.status = Order.OrderStatus.PAID
+            order.save()
+        publish.assert_called_once_with(order.pk, Order.OrderStatus.PAID)
+
+
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Phở')
+        for i in range(10):
+            Dish.objects.create(name=f'Phở bò {i}', price=50, image='x', category=self.category)
+        self.client = APIClient()
+
+    def test_etag_and_invalidation(self):
+        response = self.client.get('/dishes/')
+        self.assertEqual(len(response.data['results']), 8)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/dishes/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(len(self.client.get(f'/dishes/?category_id={self.category.id}').data['results']), 8)
+        with self.captureOnCommitCallbacks(execute=True):
+            Dish.objects.create(name='Cơm tấm', price=40, image='x')
+        response = self.client.get('/dishes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['name'], 'Cơm tấm')
+        self.assertEqual(self.client.get('/categories/').data[0]['name'], 'Phở')
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_dish_pages_follow_next_and_previous(self):
+        for i in range(20):
+            Dish.objects.create(name=f'Phở {i}', price=10, image='x')
+        seen, url = [], '/dishes/'
+        while url:
+            response = self.client.get(url)
+            seen += [dish['id'] for dish in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, sorted(Dish.objects.values_list('id', flat=True), reverse=True))
+        first = self.client.get('/dishes/?q=pho')
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 8)
+        self.assertEqual(self.client.get(second.data['previous']).data['results'], first.data['results'])
+
+    def test_order_pages(self):
+        manager = User.objects.create(username='quanly', role=User.Role.MANAGER)
+        for i in range(25):
+            Order.objects.create(user=manager)
+        self.client.force_authenticate(manager)
+        response = self.client.get('/orders/')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 5)
+
+
+class ImageVariantTests(TestCase):
+    def test_variants_follow_image(self):
+        dish = Dish.objects.create(name='Gỏi cuốn', price=30, image='image/upload/v1/dishes/a.jpg')
+        dish.refresh_from_db()
+        self.assertIn('c_fill', dish.image_variants['thumbnail'])
+        self.assertEqual(dish.image_variants['full'], dish.image.url)
+        dish.image = 'image/upload/v1/dishes/b.jpg'
+        dish.save()
+        dish.refresh_from_db()
+        self.assertIn('dishes/b', dish.image_variants['card'])
+        user = User.objects.create(username='quanly', role=User.Role.MANAGER, avatar='image/upload/v1/u.png')
+        OrderDetail.objects.create(order=Order.objects.create(user=user), dish=dish, quantity=1)
+        client = APIClient()
+        client.force_authenticate(user)
+        order = client.get('/orders/').data['results'][0]
+        self.assertEqual(order['details'][0]['dish']['image'], dish.image.url)
+        self.assertEqual(order['user']['avatar'], User.objects.get(pk=user.pk).avatar_variants['full'])
+
+
+class MenuTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Phở')
+        Dish.objects.create(name='Phở bò', price=50, image='image/upload/v1/a.jpg', category=category)
+        Dish.objects.create(name='Trà đá', price=5, image='image/upload/v1/b.jpg')
+        self.client = APIClient()
+
+    def test_formats_and_encodings(self):
+        data = json.loads(self.client.get('/menu/').content)
+        self.assertEqual([c['name'] for c in data['categories']], ['Phở', 'Món khác'])
+        response = self.client.get('/menu/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(brotli.decompress(response.content)), data)
+        response = self.client.get('/menu/', HTTP_ACCEPT_ENCODING='br;q=0.0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), data)
+        response = self.client.get('/menu/', HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0.000')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get('/menu/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), data)
+        self.assertEqual(self.client.get('/menu/', HTTP_ACCEPT='text/html').status_code, 406)
+
+
+class DishReviewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dish = Dish.objects.create(name='Bún chả', price=45, image='x')
+        staff = User.objects.create(username='phucvu', role=User.Role.WAITER)
+        for i in range(25):
+            review = Review.objects.create(user=User.objects.create(username=f'khach{i}'), dish=self.dish, rating=4,
+                                           content='Ngon')
+            ReviewReply.objects.create(review=review, user=staff, content='Cảm ơn')
+        self.client = APIClient()
+
+    def test_first_page_cached_and_next_followed(self):
+        url = f'/dishes/{self.dish.id}/reviews/'
+        first = self.client.get(url).data
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, first)
+        self.assertEqual(len(first['results']), 20)
+        self.assertEqual(len(self.client.get(first['next']).data['results']), 5)
+
+    def test_hidden_dish_stops_serving_cached_reviews(self):
+        url = f'/dishes/{self.dish.id}/reviews/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dish.is_active = False
+            self.dish.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get('/dishes/abc/reviews/').status_code, 404)
+
+
+class EstimatedCountTests(TestCase):
+    def setUp(self):
+        for i in range(25):
+            Order.objects.create(total_amount=i)
+        # Bảng "lớn" với số ước lượng lệch cao như TABLE_ROWS của InnoDB
+        patcher = mock.patch('restmans.paginators.estimated_row_count', return_value=100)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def paginator(self):
+        paginator = EstimatedCountPaginator(Order.objects.order_by('id'), 10)
+        paginator.estimate_threshold = 50
+        return paginator
+
+    def test_short_page_fixes_count(self):
+        paginator = self.paginator()
+        self.assertEqual(paginator.num_pages, 10)
+        page = paginator.page(3)
+        self.assertEqual(len(page.object_list), 5)
+        self.assertEqual((paginator.count, paginator.num_pages), (25, 3))
+
+    def test_empty_page_clamped_to_last(self):
+        paginator = self.paginator()
+        page = paginator.page(7)
+        self.assertEqual((page.number, len(page.object_list)), (3, 5))
+        self.assertEqual(paginator.num_pages, 3)
+
+    def test_admin_page_past_end(self):
+        admin = User.objects.create_superuser(username='admin', password='x')
+        self.client.force_login(admin)
+        # Trang quản trị hiển thị 100 dòng mỗi trang
+        with mock.patch.object(EstimatedCountPaginator, 'estimate_threshold', 50), \
+                mock.patch('restmans.paginators.estimated_row_count', return_value=1000):
+            response = self.client.get('/admin/restmans/order/', {'p': 8})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].paginator.num_pages, 1)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.dish = Dish.objects.create(name='Phở', price=40, image='x')
+        self.user = User.objects.create(username='khach')
+
+    def test_signals_keep_counters(self):
+        line = OrderDetail.objects.create(order=Order.objects.create(total_amount=80), dish=self.dish, quantity=2)
+        review = Review.objects.create(user=self.user, dish=self.dish, rating=4, content='ngon')
+        review.rating = 5
+        review.save()
+        line.quantity = 3
+        line.save()
+        self.dish.refresh_from_db()
+        self.assertEqual((self.dish.review_count, self.dish.rating_sum, self.dish.ordered_quantity), (1, 5, 3))
+
+    def test_drifted_counters_stay_at_zero(self):
+        line = OrderDetail.objects.create(order=Order.objects.create(total_amount=80), dish=self.dish, quantity=2)
+        review = Review.objects.create(user=self.user, dish=self.dish, rating=4, content='ngon')
+        Dish.objects.filter(pk=self.dish.pk).update(review_count=0, rating_sum=1, ordered_quantity=0)
+        review.delete()
+        line.delete()
+        counters.add_ordered_quantities({self.dish.id: 2})
+        self.dish.refresh_from_db()
+        self.assertEqual((self.dish.review_count, self.dish.rating_sum, self.dish.ordered_quantity), (0, 0, 2))
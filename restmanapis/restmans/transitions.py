@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Gửi sau mỗi lần chuyển trạng thái thành công: sender=model, pk, from_statuses, to_status, fields
+status_changed = Signal()
+
+
+def transition(model, pk, from_statuses, to_status, **fields):
+    """
+    Đổi trạng thái bằng một câu UPDATE ... WHERE id = pk AND status IN from_statuses,
+    chỉ ghi các cột thay đổi. Trả về True nếu lần chuyển này thắng.
+    """
+    if to_status in from_statuses:
+        # Không phải chuyển trạng thái: receiver sẽ xử lý nhầm như vừa vào trạng thái mới
+        raise ValueError(f'Trạng thái đích {to_status} nằm trong các trạng thái nguồn.')
+    # Các receiver (bảng tổng hợp, ...) chạy trong cùng transaction với câu UPDATE
+    with transaction.atomic():
+        won = model.objects.filter(pk=pk, status__in=from_statuses).update(
+            status=to_status, updated_date=timezone.now(), **fields) == 1
+        if won:
+            status_changed.send(sender=model, pk=pk, from_statuses=tuple(from_statuses), to_status=to_status,
+                                fields=fields)
+    return won
+
+
+def apply(instance, from_statuses, to_status, **fields):
+    """Như transition() nhưng cập nhật luôn đối tượng đang có trong bộ nhớ khi thắng."""
+    won = transition(type(instance), instance.pk, from_statuses, to_status, **fields)
+    if won:
+        instance.status = to_status
+        for name, value in fields.items():
+            setattr(instance, name, value)
+    return won
@@ -6,6 +6,7 @@ from rest_framework.routers import DefaultRouter
 router = DefaultRouter()
 router.register('categories', views.CategoryViewSet, basename='category')
 router.register('dishes', views.DishViewSet, basename='dish')
+router.register('menu', views.MenuViewSet, basename='menu')
 router.register('users', views.UserViewSet, basename='user')
 router.register('reviews', views.ReviewViewSet, basename='review')
 router.register('allreviews', views.AllReviewsViewSet, basename='allreviews')
@@ -24,5 +25,7 @@ router.register('password-reset', views.PasswordResetViewSet, basename='password
 
 
 urlpatterns = [
+    path('tables/stream/', views.table_status_stream, name='table-status-stream'),
+    path('orders/kitchen-stream/', views.kitchen_stream, name='kitchen-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import time
 import urllib
@@ -8,28 +9,37 @@ import requests
 import hmac
 import hashlib
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
+
+from asgiref.sync import sync_to_async
 
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
 from django.core.mail import send_mail
-from django.db import transaction
-from django.db.models import Q, Count, Sum
-from django.db.models.aggregates import Avg
-from django.db.models.functions import TruncMonth, TruncDay
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F, Case, When, Value, IntegerField
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.encoding import force_bytes
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from rest_framework import viewsets, generics, parsers, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
 from .models import Category, Dish, User, Review, Table, Booking, Order, OrderDetail, BookingDetail, ReviewReply
-from . import serializers, paginators, perms
+from . import (serializers, paginators, perms, caches, counters, availability, assignment, events, transitions, kitchen,
+               rollups, analytics, exports)
 from .perms import OrPermission, IsManagerAdminWaiterOrOwner
+from .renderers import MsgPackRenderer
 from .vnpay_utils import Vnpay
 
 
@@ -37,21 +47,39 @@ class CategoryViewSet(viewsets.ViewSet, generics.ListAPIView):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = serializers.CategorySerializer
 
+    def list(self, request, *args, **kwargs):
+        snapshot = caches.get_menu_snapshot()
+        if caches.not_modified(request, snapshot.etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': snapshot.etag})
+        return Response(snapshot.categories, headers={'ETag': snapshot.etag})
+
 
 class DishViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
     queryset = Dish.objects.filter(is_active=True)
     serializer_class = serializers.DishSerializer
     pagination_class = paginators.DishPagination
 
-    def get_queryset(self):
-        queryset = self.queryset
-        q = self.request.query_params.get('q')
-        if q:
-            queryset = queryset.filter(name__icontains=q)
-        cate_id = self.request.query_params.get('category_id')
-        if cate_id:
-            queryset = queryset.filter(category_id=cate_id)
-        return queryset
+    def list(self, request, *args, **kwargs):
+        snapshot = caches.get_menu_snapshot()
+        if caches.not_modified(request, snapshot.etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': snapshot.etag})
+
+        dishes = snapshot.filter_dishes(category_id=request.query_params.get('category_id'),
+                                        q=request.query_params.get('q'))
+        page = self.paginate_queryset(dishes)
+        response = self.get_paginated_response(page) if page is not None else Response(dishes)
+        response['ETag'] = snapshot.etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = caches.get_menu_snapshot()
+        try:
+            dish = snapshot.dishes_by_id[int(kwargs['pk'])]
+        except (KeyError, ValueError):
+            return Response({'error': 'Món ăn không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
+        if caches.not_modified(request, snapshot.etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': snapshot.etag})
+        return Response(dish, headers={'ETag': snapshot.etag})
 
     def get_permissions(self):
         if self.action == 'add_review':
@@ -60,21 +88,63 @@ class DishViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIVi
 
     @action(methods=['get'], detail=True, url_path='reviews')
     def get_reviews(self, request, pk):
+        # Kiểm tra món còn hoạt động trước khi đọc cache, để món vừa bị ẩn không còn trả về trang đánh giá cũ
+        try:
+            if int(pk) not in caches.get_menu_snapshot().dishes_by_id:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'Món ăn không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
+
+        paginator = paginators.ReviewPagination()
+        cache_key = None
+        if not request.query_params.get(paginator.cursor_query_param):
+            cache_key = caches.review_page_key(pk, request.build_absolute_uri())
+            data = cache.get(cache_key)
+            if data is not None:
+                return Response(data)
+
         dish = self.get_object()
-        reviews = dish.reviews.select_related('user').filter(is_active=True)
-        return Response(serializers.ReviewSerializer(reviews, many=True).data)
+        reviews = dish.reviews.filter(is_active=True).select_related('user').prefetch_related('replies__user')
+        page = paginator.paginate_queryset(reviews, request, view=self)
+        data = paginator.get_paginated_response(serializers.ReviewSerializer(page, many=True).data).data
+        if cache_key:
+            cache.set(cache_key, data, caches.REVIEW_PAGE_TIMEOUT)
+        return Response(data)
 
     @action(methods=['post'], detail=True, url_path='add-review')
     def add_review(self, request, pk):
-        if Review.objects.filter(user=request.user, dish_id=pk).exists():
-            return Response({"error": "Bạn đã đánh giá món ăn này rồi."}, status=status.HTTP_400_BAD_REQUEST)
-
         serializer = serializers.ReviewSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user, dish=self.get_object())
+        try:
+            with transaction.atomic():
+                serializer.save(user=request.user, dish=self.get_object())
+        except IntegrityError:
+            # unique_together('user', 'dish')
+            return Response({"error": "Bạn đã đánh giá món ăn này rồi."}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class MenuViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [JSONRenderer, MsgPackRenderer]
+
+    def list(self, request):
+        snapshot = caches.get_menu_snapshot()
+        renderer = request.accepted_renderer
+        encoding = caches.menu_encoding(request.headers.get('Accept-Encoding', ''))
+        etag = f'"menu-{snapshot.version}-{renderer.format}-{encoding}"'
+
+        if caches.not_modified(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(snapshot.menu_body(renderer.format, encoding), content_type=renderer.media_type)
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Vary'] = 'Accept, Accept-Encoding'
+        return response
+
+
 class UserViewSet(viewsets.ViewSet, generics.CreateAPIView):
     queryset = User.objects.filter(is_active=True)
     serializer_class = serializers.UserSerializer
@@ -97,8 +167,9 @@ class ReviewViewSet(viewsets.ViewSet, generics.DestroyAPIView, generics.UpdateAP
     queryset = Review.objects.filter(is_active=True)
     serializer_class = serializers.ReviewSerializer
     permission_classes = [perms.IsReviewOwner]
+    max_moderate_ids = 500
 
-    @action(methods=['post'], detail=True, url_path='reply', permission_classes=[OrPermission(perms.IsManagerUser, perms.IsWaiterUser)])
+    @action(methods=['post'], detail=True, url_path='reply', permission_classes=[lambda: OrPermission(perms.IsManagerUser, perms.IsWaiterUser)])
     def reply(self, request, pk=None):
         try:
             review = self.get_object()
@@ -116,10 +187,48 @@ class ReviewViewSet(viewsets.ViewSet, generics.DestroyAPIView, generics.UpdateAP
         except Review.DoesNotExist:
             return Response({'error': 'Đánh giá không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(methods=['post'], detail=False, url_path='moderate', permission_classes=[lambda: OrPermission(perms.IsManagerUser, perms.IsWaiterUser)])
+    def moderate(self, request):
+        operation = request.data.get('action')
+        ids = request.data.get('ids')
+        if operation not in ['hide', 'unhide', 'reply']:
+            return Response({'error': 'Hành động phải là hide, unhide hoặc reply.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Chuỗi cũng lặp được ("12" -> 1, 2) nên phải kiểm tra đúng là mảng trước khi chuyển kiểu
+        if not isinstance(ids, list) or any(isinstance(i, bool) for i in ids):
+            return Response({'error': 'Dữ liệu "ids" phải là một mảng mã đánh giá.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_moderate_ids:
+            return Response({'error': f'Mỗi lần chỉ xử lý tối đa {self.max_moderate_ids} đánh giá.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'Dữ liệu "ids" phải là một mảng mã đánh giá.'}, status=status.HTTP_400_BAD_REQUEST)
+        content = request.data.get('content')
+        if operation == 'reply' and not content:
+            return Response({'error': 'Nội dung phản hồi không được để trống.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            reviews = Review.objects.filter(id__in=ids)
+            targets = list(reviews.values_list('id', 'dish_id'))
+            if operation == 'reply':
+                ReviewReply.objects.bulk_create([
+                    ReviewReply(review_id=review_id, user=request.user, content=content) for review_id, _ in targets
+                ])
+                updated = len(targets)
+            else:
+                updated = reviews.update(is_active=(operation == 'unhide'), updated_date=timezone.now())
+
+            for dish_id in {dish_id for _, dish_id in targets}:
+                transaction.on_commit(lambda dish_id=dish_id: caches.invalidate_review_page(dish_id))
+
+        return Response({'action': operation, 'updated': updated,
+                         'missing': sorted(set(ids) - {review_id for review_id, _ in targets})})
+
 
 class AllReviewsViewSet(viewsets.ViewSet, generics.ListAPIView):
     queryset = Review.objects.select_related('user', 'dish').prefetch_related('replies__user').order_by('-created_date')
     serializer_class = serializers.ReviewSerializer
+    pagination_class = paginators.ReviewPagination
     permission_classes = [lambda: OrPermission(perms.IsManagerUser, perms.IsWaiterUser)]
 
 
@@ -144,13 +253,32 @@ class TableViewSet(viewsets.ViewSet, generics.ListAPIView):
             return Response({'error': 'Định dạng thời gian hoặc số lượng khách không hợp lệ.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        overlapping_bookings = BookingDetail.objects.filter(
-            Q(start_time__lt=end_time) & Q(end_time__gt=start_time)
-        )
-        booked_table_ids = overlapping_bookings.values_list('table_id', flat=True)
+        booked_table_ids = availability.busy_table_ids(start_time, end_time)
         available_tables = Table.objects.filter(capacity__gte=guests).exclude(id__in=booked_table_ids)
         return Response(self.get_serializer(available_tables, many=True).data)
 
+    @action(methods=['get'], detail=False, url_path='availability-grid')
+    def availability_grid(self, request):
+        try:
+            day = date.fromisoformat(request.query_params.get('date', ''))
+            slot_minutes = int(request.query_params.get('slot', 30))
+            guests = int(request.query_params.get('guests', 1))
+        except (ValueError, TypeError):
+            return Response({'error': 'Định dạng ngày, độ dài ô hoặc số lượng khách không hợp lệ.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not availability.SLOT_MINUTES <= slot_minutes <= 240 or slot_minutes % availability.SLOT_MINUTES:
+            return Response({'error': f'Độ dài ô phải là bội số của {availability.SLOT_MINUTES} phút và không quá 240 phút.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        tables = Table.objects.filter(is_active=True, capacity__gte=guests).order_by('table_number')
+        grid = availability.day_grid(day, slot_minutes, [t.id for t in tables])
+        return Response({
+            'date': day,
+            'slot_minutes': slot_minutes,
+            'tables': self.get_serializer(tables, many=True).data,
+            'slots': [{'start_time': start, 'end_time': end, 'busy_table_ids': busy} for start, end, busy in grid],
+        })
+
     @action(methods=['get'], detail=False, url_path='statuses', permission_classes=[perms.IsWaiterOrManagerUser])
     def statuses(self, request):
         tables = Table.objects.all().order_by('table_number')
@@ -172,24 +300,131 @@ class TableViewSet(viewsets.ViewSet, generics.ListAPIView):
             return Response({'error': 'Bàn không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
 
 
+async def staff_event_stream(request, broadcaster, load_snapshot):
+    if not isinstance(request, ASGIRequest):
+        # Dưới WSGI (runserver) Django đọc hết luồng bất đồng bộ trước khi gửi: luồng vô hạn sẽ giữ worker mãi mãi
+        return JsonResponse({'error': 'Luồng sự kiện cần chạy server ASGI (uvicorn).'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    user = await events.authenticate(request)
+    if user is None:
+        return JsonResponse({'error': 'Token không hợp lệ hoặc đã hết hạn.'}, status=status.HTTP_401_UNAUTHORIZED)
+    if user.role not in [User.Role.MANAGER, User.Role.ADMIN, User.Role.WAITER]:
+        return JsonResponse({'error': 'Bạn không có quyền truy cập.'}, status=status.HTTP_403_FORBIDDEN)
+
+    # Đăng ký trước khi chụp dữ liệu ban đầu để không lỡ thay đổi nào ở giữa
+    try:
+        subscription = await broadcaster.subscribe()
+    except asyncio.TimeoutError:
+        return JsonResponse({'error': 'Không kết nối được kênh sự kiện, vui lòng thử lại sau.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        snapshot = await sync_to_async(load_snapshot)()
+    except BaseException:
+        broadcaster.unsubscribe(subscription)
+        raise
+    response = StreamingHttpResponse(broadcaster.stream(subscription, events.message('snapshot', snapshot)),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def table_status_stream(request):
+    return await staff_event_stream(request, events.table_status,
+                                    lambda: [events.table_data(t) for t in Table.objects.order_by('table_number')])
+
+
+async def kitchen_stream(request):
+    return await staff_event_stream(request, events.kitchen, kitchen.open_lines)
+
+
+def send_booking_confirmation(booking, tables):
+    try:
+        customer_email = booking.user.email
+        if customer_email:
+            subject = f"Xác nhận đặt bàn thành công tại Nhà hàng SpicyTown - Mã #{booking.id}"
+
+            context = {
+                'user': booking.user,
+                'booking': booking,
+                'tables': tables,
+            }
+
+            html_message = render_to_string('emails/booking_confirmation.html', context)
+
+            plain_message = f"Chào {booking.user.first_name}, đơn đặt bàn #{booking.id} của bạn đã được xác nhận thành công."
+
+            send_mail(
+                subject=subject,
+                message=plain_message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=[customer_email],
+                html_message=html_message,
+                fail_silently=False,
+            )
+    except Exception as e:
+        logging.error(f"Lỗi gửi email xác nhận cho đơn #{booking.id}: {e}")
+
+
+def parse_time_bound(value, end=False):
+    """Nhận ngày (YYYY-MM-DD) hoặc thời điểm ISO; với ngày và end=True thì lấy đầu ngày hôm sau."""
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, datetime.min.time())
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(value)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def filter_listing(queryset, params, time_field, statuses):
+    """Lọc danh sách theo from/to trên time_field và status (có thể nhiều giá trị, cách nhau bởi dấu phẩy)."""
+    try:
+        if params.get('from'):
+            queryset = queryset.filter(**{f'{time_field}__gte': parse_time_bound(params['from'])})
+        if params.get('to'):
+            queryset = queryset.filter(**{f'{time_field}__lt': parse_time_bound(params['to'], end=True)})
+    except ValueError:
+        raise ValidationError({'error': 'Tham số from/to phải là ngày (YYYY-MM-DD) hoặc thời điểm ISO 8601.'})
+    if params.get('status'):
+        requested = params['status'].upper().split(',')
+        if not set(requested) <= set(statuses):
+            raise ValidationError({'error': 'Trạng thái không hợp lệ.'})
+        queryset = queryset.filter(status__in=requested)
+    return queryset
+
+
+def export_params(params):
+    file_type = params.get('file_type', 'csv')
+    if file_type not in exports.CONTENT_TYPES:
+        raise ValidationError({'error': 'file_type phải là csv hoặc xlsx.'})
+    return file_type, filter_listing(Order.objects.all(), params, 'created_date', Order.OrderStatus.values)
+
+
 class BookingViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.RetrieveAPIView):
-    queryset = Booking.objects.all()
+    queryset = Booking.objects.select_related('user').prefetch_related('details__table')
     serializer_class = serializers.BookingSerializer
+    pagination_class = paginators.BookingPagination
     permission_classes = [permissions.IsAuthenticated, IsManagerAdminWaiterOrOwner]
 
     def get_queryset(self):
         user = self.request.user
-        if user.role in [User.Role.MANAGER, User.Role.ADMIN, User.Role.WAITER]:
-            return self.queryset
-        return self.queryset.filter(user=user)
+        queryset = self.queryset
+        if user.role not in [User.Role.MANAGER, User.Role.ADMIN, User.Role.WAITER]:
+            queryset = queryset.filter(user=user)
+        if self.action in ['list', 'pending_bookings']:
+            queryset = self.filter_bookings(queryset)
+        return queryset
+
+    def filter_bookings(self, queryset):
+        return filter_listing(queryset, self.request.query_params, 'booking_time', Booking.BookingStatus.values)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
     def create(self, request, *args, **kwargs):
-        available_tables_count = Table.objects.filter(status=Table.TableStatus.AVAILABLE).count()
-
-        if available_tables_count <= 0:
+        if caches.free_table_count() <= 0:
             return Response(
                 {'error': 'Hiện tại nhà hàng đã hết bàn trống. Vui lòng quay lại sau hoặc liên hệ trực tiếp.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -201,52 +436,44 @@ class BookingViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retr
     def assign_details(self, request, pk):
         try:
             booking = self.get_object()
-            if booking.status != 'PENDING':
-                return Response({'error': 'Chỉ có thể gán bàn cho đơn đặt bàn đang chờ.'},
-                                status=status.HTTP_400_BAD_REQUEST)
 
             details_data = request.data.get('details')
             if not isinstance(details_data, list) or not details_data:
                 return Response({'error': 'Dữ liệu "details" phải là một mảng và không được rỗng.'},
                                 status=status.HTTP_400_BAD_REQUEST)
-
-            assigned_tables_info = []
+            details = serializers.BookingDetailSerializer(data=details_data, many=True)
+            if not details.is_valid():
+                return Response({'error': details.errors}, status=status.HTTP_400_BAD_REQUEST)
+            details = details.validated_data
+            if any(d['end_time'] <= d['start_time'] for d in details):
+                return Response({'error': 'Thời gian kết thúc phải sau thời gian bắt đầu.'},
+                                status=status.HTTP_400_BAD_REQUEST)
 
             with transaction.atomic():
+                # Khóa đơn và các bàn (theo thứ tự id để tránh deadlock) trước khi kiểm tra trùng lịch
+                booking = Booking.objects.select_for_update().select_related('user').get(pk=booking.pk)
+                if booking.status != Booking.BookingStatus.PENDING:
+                    return Response({'error': 'Chỉ có thể gán bàn cho đơn đặt bàn đang chờ.'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                tables = Table.objects.select_for_update().order_by('pk').in_bulk({d['table_id'] for d in details})
+                if len(tables) != len({d['table_id'] for d in details}):
+                    raise Table.DoesNotExist
+
+                conflicts = assignment.conflicting_table_ids(
+                    [(d['table_id'], d['start_time'], d['end_time']) for d in details], exclude_booking_ids=[booking.id])
+                if conflicts:
+                    return Response({'error': 'Bàn đã được đặt trong khoảng thời gian này: ' + ', '.join(
+                        tables[t].table_number for t in sorted(conflicts))}, status=status.HTTP_409_CONFLICT)
+
+                old_intervals = list(booking.details.values_list('start_time', 'end_time'))
                 booking.details.all().delete()
-                for detail in details_data:
-                    table = Table.objects.get(pk=detail.get('table_id'))
-                    BookingDetail.objects.create(booking=booking, table=table, **detail)
-                    assigned_tables_info.append(table)
-
-            booking.status = booking.BookingStatus.CONFIRMED
-            booking.save()
-
-            try:
-                customer_email = booking.user.email
-                if customer_email:
-                    subject = f"Xác nhận đặt bàn thành công tại Nhà hàng SpicyTown - Mã #{booking.id}"
-
-                    context = {
-                        'user': booking.user,
-                        'booking': booking,
-                        'tables': assigned_tables_info,
-                    }
-
-                    html_message = render_to_string('emails/booking_confirmation.html', context)
-
-                    plain_message = f"Chào {booking.user.first_name}, đơn đặt bàn #{booking.id} của bạn đã được xác nhận thành công."
-
-                    send_mail(
-                        subject=subject,
-                        message=plain_message,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[customer_email],
-                        html_message=html_message,
-                        fail_silently=False,
-                    )
-            except Exception as e:
-                logging.error(f"Lỗi gửi email xác nhận cho đơn #{booking.id}: {e}")
+                BookingDetail.objects.bulk_create([BookingDetail(booking=booking, **d) for d in details])
+                booking.status = booking.BookingStatus.CONFIRMED
+                booking.save()
+                intervals = old_intervals + [(d['start_time'], d['end_time']) for d in details]
+                transaction.on_commit(lambda: availability.invalidate(intervals))
+
+            send_booking_confirmation(booking, [tables[d['table_id']] for d in details])
 
             return Response(self.get_serializer(booking).data)
         except (Booking.DoesNotExist, Table.DoesNotExist):
@@ -254,11 +481,62 @@ class BookingViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retr
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['post'], detail=False, url_path='auto-assign', permission_classes=[perms.IsManagerUser])
+    def auto_assign(self, request):
+        try:
+            day = date.fromisoformat(str(request.data.get('date', '')))
+        except ValueError:
+            return Response({'error': 'Ngày không hợp lệ (định dạng YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        apply = request.data.get('apply') in [True, 'true', '1', 1]
+
+        try:
+            with transaction.atomic():
+                # Khóa đơn trước rồi đến bàn, cùng theo thứ tự id như assign_details để tránh deadlock
+                bookings = assignment.pending_for_day(day).select_related('user')
+                if apply:
+                    bookings = bookings.select_for_update(of=('self',)).order_by('pk')
+                bookings = {b.id: b for b in bookings}
+                tables = list(Table.objects.select_for_update().filter(is_active=True).order_by('pk')) if apply else None
+                proposal, unassigned = assignment.propose(bookings.values(), tables)
+
+                if apply and proposal:
+                    details = []
+                    for booking_id, chosen in proposal.items():
+                        start, end = assignment.booking_interval(bookings[booking_id])
+                        details.extend(BookingDetail(booking_id=booking_id, table=t, start_time=start, end_time=end)
+                                       for t in chosen)
+                    BookingDetail.objects.bulk_create(details)
+                    Booking.objects.filter(pk__in=proposal).update(status=Booking.BookingStatus.CONFIRMED,
+                                                                   updated_date=timezone.now())
+                    intervals = [(d.start_time, d.end_time) for d in details]
+                    transaction.on_commit(lambda: availability.invalidate(intervals))
+        except DatabaseError:
+            # Deadlock hoặc hết thời gian chờ khóa: giao dịch đã rollback, có thể gửi lại yêu cầu
+            return Response({'error': 'Dữ liệu đặt bàn đang được cập nhật, vui lòng thử lại.'},
+                            status=status.HTTP_409_CONFLICT)
+
+        if apply:
+            for booking_id, chosen in proposal.items():
+                booking = bookings[booking_id]
+                booking.status = Booking.BookingStatus.CONFIRMED
+                send_booking_confirmation(booking, chosen)
+
+        return Response({
+            'applied': apply,
+            'assignments': [{
+                'booking_id': booking_id,
+                'guests': bookings[booking_id].number_of_guests,
+                'table_ids': [t.id for t in chosen],
+                'wasted_seats': sum(t.capacity for t in chosen) - bookings[booking_id].number_of_guests,
+            } for booking_id, chosen in proposal.items()],
+            'unassigned': unassigned,
+        })
+
     @action(methods=['get'], detail=False, url_path='pending', permission_classes=[perms.IsManagerUser])
     def pending_bookings(self, request):
         bookings = self.get_queryset().filter(status=Booking.BookingStatus.PENDING)
-        serializer = self.get_serializer(bookings, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        page = self.paginate_queryset(bookings)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
     @action(methods=['patch'], detail=True, url_path='cancel', permission_classes=[permissions.IsAuthenticated])
     def cancel(self, request, pk):
@@ -270,9 +548,7 @@ class BookingViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retr
                 return Response({'error': 'Bạn không có quyền thực hiện hành động này.'},
                                 status=status.HTTP_403_FORBIDDEN)
 
-            if booking.status in ['PENDING', 'CONFIRMED']:
-                booking.status = 'CANCELLED'
-                booking.save()
+            if transitions.apply(booking, ['PENDING', 'CONFIRMED'], 'CANCELLED'):
                 return Response(self.get_serializer(booking).data, status=status.HTTP_200_OK)
             else:
                 return Response({'error': 'Không thể hủy đơn đặt bàn đã hoàn thành hoặc đã bị hủy.'},
@@ -285,9 +561,12 @@ class BookingViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retr
         try:
             booking = self.get_object()
 
-            if booking.status == 'CONFIRMED':
-                booking.status = 'COMPLETED'
-                booking.save()
+            with transaction.atomic():
+                completed = transitions.apply(booking, ['CONFIRMED'], 'COMPLETED')
+                if completed:
+                    events.set_table_status(booking.details.values_list('table_id', flat=True),
+                                            Table.TableStatus.CLEANING)
+            if completed:
                 return Response(self.get_serializer(booking).data, status=status.HTTP_200_OK)
             else:
                 return Response(
@@ -298,14 +577,35 @@ class BookingViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retr
             return Response({'error': 'Đơn đặt bàn không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
 
 
+def load_cart(cart):
+    """Gộp các dòng trùng món và lấy tất cả món ăn bằng một truy vấn -> ({dish_id: số lượng}, {dish_id: Dish})."""
+    if not isinstance(cart, list):
+        raise TypeError('cart phải là một mảng')
+    quantities = {}
+    for item in cart:
+        dish_id, quantity = int(item['dish_id']), int(item['quantity'])
+        if quantity <= 0:
+            raise ValueError('số lượng phải lớn hơn 0')
+        quantities[dish_id] = quantities.get(dish_id, 0) + quantity
+    dishes = Dish.objects.filter(is_active=True).only('id', 'name', 'price').in_bulk(quantities)
+    if len(dishes) != len(quantities):
+        raise Dish.DoesNotExist
+    return quantities, dishes
+
+
 class OrderViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.RetrieveAPIView):
     queryset = Order.objects.all()
     serializer_class = serializers.OrderSerializer
+    pagination_class = paginators.OrderPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def get_permissions(self):
         if self.action in ['place_order_at_table', 'initiate_payment']:
             return [permissions.AllowAny()]
+        if self.action == 'cook_now':
+            return [perms.IsWaiterOrManagerUser()]
+        if self.action in ['export_orders', 'export_lines']:
+            return [perms.IsManagerUser()]
         return [permissions.IsAuthenticated()]
 
     def get_object(self):
@@ -313,36 +613,58 @@ class OrderViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retrie
 
     def get_queryset(self):
         user = self.request.user
-        if user.role in [User.Role.MANAGER, User.Role.WAITER]:
-            return Order.objects.all()
-        return Order.objects.filter(user=user)
+        queryset = Order.objects.select_related('user', 'table').prefetch_related('details__dish')
+        if user.role not in [User.Role.MANAGER, User.Role.WAITER]:
+            queryset = queryset.filter(user=user)
+        if self.action == 'list':
+            queryset = filter_listing(queryset, self.request.query_params, 'created_date', Order.OrderStatus.values)
+        return queryset
 
     def create(self, request, *args, **kwargs):
         cart = request.data.get('cart')
         if not cart:
             return Response({"error": "Giỏ hàng không được để trống."}, status=status.HTTP_400_BAD_REQUEST)
         try:
+            quantities, dishes = load_cart(cart)
             with transaction.atomic():
                 order = Order.objects.create(
                     user=request.user,
                     payment_method=request.data.get('payment_method', 'CASH'),
                     note=request.data.get('note'),
                     shipping_address=request.data.get('shipping_address'),
+                    total_amount=sum(dishes[dish_id].price * q for dish_id, q in quantities.items()),
                 )
-                total_amount = 0
-                for item in cart:
-                    dish = Dish.objects.get(pk=item['dish_id'], is_active=True)
-                    quantity = int(item['quantity'])
-                    OrderDetail.objects.create(order=order, dish=dish, quantity=quantity, unit_price=dish.price)
-                    total_amount += dish.price * quantity
-                order.total_amount = total_amount
-                order.save()
-                return Response(serializers.OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+                OrderDetail.objects.bulk_create([
+                    OrderDetail(order=order, dish_id=dish_id, quantity=q, unit_price=dishes[dish_id].price)
+                    for dish_id, q in quantities.items()
+                ])
+                # bulk_create không gửi signal nên tự cập nhật bộ đếm và báo cho bếp
+                counters.add_ordered_quantities(quantities)
+                kitchen.publish_lines({'order_id': order.id, 'table_id': None, 'dish_id': dish_id,
+                                       'dish_name': dishes[dish_id].name, 'quantity': q}
+                                      for dish_id, q in quantities.items())
+            order = Order.objects.select_related('user', 'table').prefetch_related('details__dish').get(pk=order.pk)
+            return Response(serializers.OrderSerializer(order).data, status=status.HTTP_201_CREATED)
         except Dish.DoesNotExist:
             return Response({"error": "Món ăn không tồn tại hoặc đã bị ẩn."}, status=status.HTTP_400_BAD_REQUEST)
-        except (ValueError, TypeError) as e:
+        except (ValueError, TypeError, KeyError) as e:
             return Response({"error": f"Dữ liệu giỏ hàng không hợp lệ: {e}"}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['get'], detail=False, url_path='cook-now', permission_classes=[perms.IsWaiterOrManagerUser])
+    def cook_now(self, request):
+        return Response(kitchen.cook_now())
+
+    @action(methods=['get'], detail=False, url_path='export', permission_classes=[perms.IsManagerUser])
+    def export_orders(self, request):
+        """?file_type=csv|xlsx&from=&to=&status="""
+        file_type, orders = export_params(request.query_params)
+        return exports.orders_response(orders, file_type)
+
+    @action(methods=['get'], detail=False, url_path='export-lines', permission_classes=[perms.IsManagerUser])
+    def export_lines(self, request):
+        file_type, orders = export_params(request.query_params)
+        return exports.lines_response(OrderDetail.objects.filter(order__in=orders), file_type)
+
     @action(methods=['post'], detail=False, url_path='place-order-at-table')
     def place_order_at_table(self, request):
         table_id = request.data.get('table_id')
@@ -350,25 +672,36 @@ class OrderViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retrie
         if not all([table_id, cart]):
             return Response({"error": "Vui lòng cung cấp table_id và cart."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            table = Table.objects.get(pk=table_id)
+            quantities, dishes = load_cart(cart)
             with transaction.atomic():
-                order, created = Order.objects.get_or_create(
-                    table=table, status=Order.OrderStatus.PENDING, defaults={'table': table}
-                )
-                total_amount = order.total_amount or 0
-                for item in cart:
-                    dish = Dish.objects.get(pk=item['dish_id'], is_active=True)
-                    quantity = int(item['quantity'])
-                    order_detail, created_detail = OrderDetail.objects.get_or_create(
-                        order=order, dish=dish, defaults={'quantity': quantity, 'unit_price': dish.price}
-                    )
-                    if not created_detail:
-                        order_detail.quantity += quantity
-                        order_detail.save()
-                    total_amount += dish.price * quantity
-                order.total_amount = total_amount
-                order.save()
-                return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
+                # Khóa dòng bàn để các điện thoại cùng bàn gọi món lần lượt, không tạo trùng hóa đơn đang chờ
+                table = Table.objects.select_for_update().get(pk=table_id)
+                order = Order.objects.filter(table=table, status=Order.OrderStatus.PENDING).order_by('created_date').first()
+                if order is None:
+                    order = Order.objects.create(table=table)
+
+                existing = dict(order.details.filter(dish_id__in=quantities).values_list('dish_id', 'quantity'))
+                if existing:
+                    added = Case(*[When(dish_id=dish_id, then=Value(quantities[dish_id])) for dish_id in existing],
+                                 default=Value(0), output_field=IntegerField())
+                    OrderDetail.objects.filter(order=order, dish_id__in=existing).update(quantity=F('quantity') + added)
+                OrderDetail.objects.bulk_create([
+                    OrderDetail(order=order, dish_id=dish_id, quantity=q, unit_price=dishes[dish_id].price)
+                    for dish_id, q in quantities.items() if dish_id not in existing
+                ])
+                Order.objects.filter(pk=order.pk).update(total_amount=F('total_amount') + sum(
+                    dishes[dish_id].price * q for dish_id, q in quantities.items()))
+                counters.add_ordered_quantities(quantities)
+                kitchen.publish_lines({'order_id': order.id, 'table_id': table.id, 'dish_id': dish_id,
+                                       'dish_name': dishes[dish_id].name, 'quantity': existing.get(dish_id, 0) + q}
+                                      for dish_id, q in quantities.items())
+                if table.status != Table.TableStatus.OCCUPIED:
+                    events.set_table_status([table.id], Table.TableStatus.OCCUPIED)
+
+            order = Order.objects.select_related('user', 'table').prefetch_related('details__dish').get(pk=order.pk)
+            return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
+        except Dish.DoesNotExist:
+            return Response({"error": "Món ăn không tồn tại hoặc đã bị ẩn."}, status=status.HTTP_400_BAD_REQUEST)
         except Table.DoesNotExist:
             return Response({"error": "Bàn không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -417,9 +750,22 @@ class OrderViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retrie
 
             serializer = self.get_serializer(order, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            fields = dict(serializer.validated_data)
+
+            # Chỉ ghi các cột được gửi lên; đổi trạng thái chỉ thắng nếu trạng thái chưa bị ai đổi trước.
+            # Trạng thái gửi lại y nguyên (form luôn gửi kèm) không phải là một lần chuyển trạng thái.
+            new_status = fields.pop('status', order.status)
+            with transaction.atomic():
+                # Chuyển trạng thái trước để số liệu cũ được trừ/cộng đúng nhóm, sau đó mới ghi các cột còn lại
+                if new_status != order.status and not transitions.apply(order, [order.status], new_status):
+                    return Response({'error': 'Trạng thái hóa đơn vừa được thay đổi, vui lòng tải lại.'},
+                                    status=status.HTTP_409_CONFLICT)
+                if fields:
+                    rollups.update_order(order.pk, **fields)
+                    for name, value in fields.items():
+                        setattr(order, name, value)
 
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(self.get_serializer(order).data, status=status.HTTP_200_OK)
 
         except Order.DoesNotExist:
             return Response({'error': 'Hóa đơn không tồn tại.'}, status=status.HTTP_404_NOT_FOUND)
@@ -480,9 +826,7 @@ class OrderViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retrie
                                 status=status.HTTP_403_FORBIDDEN)
 
 
-            if order.status == 'PENDING':
-                order.status = 'CANCELLED'
-                order.save()
+            if transitions.apply(order, ['PENDING'], 'CANCELLED'):
                 return Response(self.get_serializer(order).data, status=status.HTTP_200_OK)
             else:
                 return Response(
@@ -501,9 +845,7 @@ class OrderViewSet(viewsets.ViewSet, generics.ListCreateAPIView, generics.Retrie
                 return Response({'error': 'Bạn không có quyền thực hiện hành động này.'},
                                 status=status.HTTP_403_FORBIDDEN)
 
-            if order.status == 'SHIPPING':
-                order.status = 'COMPLETED'
-                order.save()
+            if transitions.apply(order, ['SHIPPING'], 'COMPLETED'):
                 return Response(self.get_serializer(order).data, status=status.HTTP_200_OK)
             else:
                 return Response(
@@ -529,20 +871,14 @@ class VNPayIPNViewSet(viewsets.ViewSet):
             txn_ref = input_data.get("vnp_TxnRef")
             order_id = txn_ref.split("_")[0]
 
-            try:
-                order = Order.objects.get(id=order_id)
-                if order.status == 'PENDING':
-                    if response_code == "00":
-                        order.status = "PAID"
-                        order.payment_method = "VNPAY"
-                        order.save()
-                    else:
-                        order.status = "CANCELLED"
-                        order.save()
+            if response_code == "00":
+                won = transitions.transition(Order, order_id, ['PENDING'], 'PAID', payment_method='VNPAY')
+            else:
+                won = transitions.transition(Order, order_id, ['PENDING'], 'CANCELLED')
 
+            if won or Order.objects.filter(pk=order_id).exists():
                 return Response({"RspCode": "00", "Message": "Confirm Success"})
-            except Order.DoesNotExist:
-                return Response({"RspCode": "01", "Message": "Order not found"})
+            return Response({"RspCode": "01", "Message": "Order not found"})
         else:
             logging.warning("VNPay IPN: Invalid signature.")
             return Response({"RspCode": "97", "Message": "Invalid signature"})
@@ -596,14 +932,9 @@ class MomoIPNViewSet(viewsets.ViewSet):
             result_code = -1
         original_order_id = data.get('orderId', '').split('_')[0]
         if result_code == 0:
-            try:
-                order = Order.objects.get(pk=original_order_id)
-                if order.status == 'PENDING':
-                    order.status = 'PAID'
-                    order.payment_method = 'MOMO'
-                    order.save()
-                    logging.info(f"Order {original_order_id} updated to COMPLETED via MoMo IPN.")
-            except Order.DoesNotExist:
+            if transitions.transition(Order, original_order_id, ['PENDING'], 'PAID', payment_method='MOMO'):
+                logging.info(f"Order {original_order_id} updated to PAID via MoMo IPN.")
+            elif not Order.objects.filter(pk=original_order_id).exists():
                 logging.error(f"Order {original_order_id} not found for MoMo IPN.")
         else:
             logging.warning(f"MoMo IPN received failed status for order {original_order_id}: {data.get('message')}")
@@ -627,40 +958,73 @@ class StatsViewSet(viewsets.ViewSet):
 
     @action(methods=['get'], detail=False, url_path='revenue')
     def revenue_stats(self, request):
+        """?year= theo tháng, ?year=&month= hoặc ?from=&to= theo ngày."""
+        today = timezone.localdate()
+        params = request.query_params
         try:
-            year = request.query_params.get('year', datetime.now().year)
-
-            stats = Order.objects.filter(
-                created_date__year=year,
-                status='COMPLETED'
-            ).annotate(
-                month=TruncMonth('created_date')
-            ).values('month').annotate(
-                total=Sum('total_amount')
-            ).order_by('month')
-
-            return Response(stats)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            year = int(params.get('year', today.year))
+            month = int(params['month']) if params.get('month') else None
+            if params.get('from') or params.get('to'):
+                start, end = parse_date(params.get('from', '')), parse_date(params.get('to', ''))
+                if not start or not end or start > end:
+                    raise ValueError
+            elif month:
+                start = date(year, month, 1)
+                end = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+            else:
+                start = end = None
+        except ValueError:
+            return Response({'error': 'Khoảng thời gian thống kê không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start is None:
+            stats = caches.get_stats('revenue', (year,), f'year={year}', lambda: rollups.revenue_by_month(year),
+                                     closed=year < today.year)
+        else:
+            stats = caches.get_stats('revenue', range(start.year, end.year + 1), f'{start}:{end}',
+                                     lambda: rollups.revenue_by_day(start, end), closed=end < today)
+        return Response(stats)
+
+    @action(methods=['get'], detail=False, url_path='cube')
+    def cube(self, request):
+        """?from=&to=&dimensions=hour,weekday,payment_method,table,category (mặc định: từ đầu năm, mọi chiều)."""
+        today = timezone.localdate()
+        params = request.query_params
+        dimensions = [d for d in params.get('dimensions', ','.join(analytics.DIMENSIONS)).split(',') if d]
+        if not dimensions or set(dimensions) - set(analytics.DIMENSIONS):
+            return Response({'error': f'Các chiều thống kê hợp lệ: {", ".join(analytics.DIMENSIONS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = parse_date(params['from']) if params.get('from') else date(today.year, 1, 1)
+            end = parse_date(params['to']) if params.get('to') else today
+            if not start or not end or start > end:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'Khoảng thời gian thống kê không hợp lệ.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dimensions = [d for d in analytics.DIMENSIONS if d in dimensions]
+        # Dùng chung phiên bản với thống kê doanh thu; số khách lấy từ đơn đặt bàn nên chỉ giữ cache ngắn hạn
+        stats = caches.get_stats('revenue', range(start.year, end.year + 1),
+                                 f'cube:{start}:{end}:{",".join(dimensions)}',
+                                 lambda: analytics.cube(start, end, dimensions))
+        return Response({'from': start, 'to': end, **stats})
 
     @action(methods=['get'], detail=False, url_path='dish-popularity')
     def dish_popularity_stats(self, request):
-        stats = Dish.objects.annotate(
-            order_count=Count('order_details')
-        ).filter(order_count__gt=0).values('id', 'name', 'order_count').order_by('-order_count')
+        stats = caches.get_stats('dishes', (), '', lambda: list(Dish.objects.filter(ordered_quantity__gt=0).values(
+            'id', 'name', order_count=F('ordered_quantity')
+        ).order_by('-order_count')))
 
         return Response(stats)
 
     @action(methods=['get'], detail=False, url_path='review-summary')
     def review_summary(self, request):
-        stats = Dish.objects.annotate(
-            review_count=Count('reviews'),
-            avg_rating=Avg('reviews__rating')
-        ).filter(review_count__gt=0).values(
+        stats = caches.get_stats('reviews', (), '', lambda: list(Dish.objects.filter(review_count__gt=0).annotate(
+            avg_rating=counters.avg_rating()
+        ).values(
             'name',
             'review_count',
             'avg_rating'
-        ).order_by('-avg_rating', '-review_count')[:10]
+        ).order_by('-avg_rating', '-review_count')[:10]))
 
         return Response(stats)
 
@@ -768,15 +1132,13 @@ class ChatbotViewSet(viewsets.ViewSet):
             all_dishes = Dish.objects.filter(is_active=True)
             menu_context = "\n".join([f"- {d.name}: {d.price} VND" for d in all_dishes])
 
-            best_sellers = Dish.objects.annotate(
-                order_count=Count('order_details')
-            ).filter(order_count__gt=0).order_by('-order_count')[:5]
+            best_sellers = Dish.objects.filter(ordered_quantity__gt=0).order_by('-ordered_quantity')[:5]
 
             top_rated = Dish.objects.annotate(
-                avg_rating=Avg('reviews__rating')
+                avg_rating=counters.avg_rating()
             ).filter(avg_rating__gte=4).order_by('-avg_rating')[:5]
 
-            best_seller_context = "\n".join([f"- {d.name} ({d.order_count} lượt gọi)" for d in best_sellers])
+            best_seller_context = "\n".join([f"- {d.name} ({d.ordered_quantity} lượt gọi)" for d in best_sellers])
             top_rated_context = "\n".join([f"- {d.name} (Điểm: {d.avg_rating:.1f}/5)" for d in top_rated])
 
             system_prompt = (
@@ -6,14 +6,17 @@ const BASE_URL = "http://192.168.1.105:8000/";
 export const endpoints = {
     'categories': '/categories/',
     'dishes': '/dishes/',
+    'menu': '/menu/',
     'current-user': '/users/current-user/',
     'login': '/o/token/',
     'register': '/users/',
     'bookings': '/bookings/',
     'booking-detail': (bookingId) => `/bookings/${bookingId}/`,
     'available-tables': '/tables/available/',
+    'availability-grid': '/tables/availability-grid/',
     'assign-details': (bookingId) => `/bookings/${bookingId}/assign-details/`,
     'pending-bookings': '/bookings/pending/',
+    'auto-assign-bookings': '/bookings/auto-assign/',
     'cancel-booking': (bookingId) => `/bookings/${bookingId}/cancel/`,
     'orders': '/orders/',
     'order-detail': (orderId) => `/orders/${orderId}/`,
@@ -26,6 +29,7 @@ export const endpoints = {
     'dish-reviews': (dishId) => `/dishes/${dishId}/reviews/`,
     'add-review': (dishId) => `/dishes/${dishId}/add-review/`,
     'add-reply': (reviewId) => `/reviews/${reviewId}/reply/`,
+    'moderate-reviews': '/reviews/moderate/',
     'all-reviews': '/allreviews/',
     'update-review': (reviewId) => `/reviews/${reviewId}/`,
     'delete-review': (reviewId) => `/reviews/${reviewId}/`,
@@ -40,6 +44,9 @@ export const endpoints = {
     'complete-booking': (bookingId) => `/bookings/${bookingId}/complete/`,
     'cancel-order': (orderId) => `/orders/${orderId}/cancel/`,
     'confirm-order': (orderId) => `/orders/${orderId}/confirm/`,
+    'table-stream': '/tables/stream/',
+    'kitchen-stream': '/orders/kitchen-stream/',
+    'cook-now': '/orders/cook-now/',
 }
 
 export const authApi = () => {
@@ -51,6 +58,10 @@ export const authApi = () => {
     })
 }
 
+export const eventSource = (path) => {
+    return new EventSource(`${BASE_URL.replace(/\/$/, '')}${path}?access_token=${cookie.load("token")}`);
+}
+
 export default axios.create({
     baseURL: BASE_URL
 })
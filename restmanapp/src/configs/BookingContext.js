@@ -16,7 +16,7 @@ export const BookingProvider = ({ children }) => {
             try {
                 if (!user) return;
                 const res = await authApi().get(endpoints['pending-bookings']);
-                setBooking(res.data);
+                setBooking(res.data.results || res.data);
             } catch (err) {
                 console.error("Lỗi khi lấy danh sách đặt bàn:", err);
             }
@@ -9,23 +9,39 @@ export const OrderProvider = ({ children }) => {
   const { user } = useContext(UserContext);
   const hasLoaded = useRef(false); // ✅ Ngăn load lại nhiều lần
 
-  const loadOrders = useCallback(async (forceReload = false) => {
+  const [nextUrl, setNextUrl] = useState(null);
+  const latestRequest = useRef(0); // Chỉ nhận kết quả của lần tải mới nhất khi bộ lọc đổi liên tục
+
+  // filters: { status, from, to } được lọc ở server; kết quả phân trang theo con trỏ (next)
+  const loadOrders = useCallback(async (forceReload = false, filters = {}) => {
   if (!user || !['WAITER', 'MANAGER', 'ADMIN'].includes(user.role)) return;
 
+  const request = ++latestRequest.current;
   try {
     const res = await authApi().get(endpoints["orders"], {
-      params: { t: Date.now() } // ✅ tránh cache
+      params: { ...filters, t: Date.now() } // ✅ tránh cache
     });
+    if (request !== latestRequest.current) return;
     const data = res.data.results || res.data;
     if (Array.isArray(data)) {
-      setOrders(data.sort((a, b) => new Date(b.created_date) - new Date(a.created_date)));
+      setOrders(data);
     }
+    setNextUrl(res.data.next || null);
     if (forceReload) console.log("🔄 Dữ liệu đã được reload mới nhất từ API!");
   } catch (err) {
     console.error("Lỗi khi tải danh sách hóa đơn:", err);
   }
 }, [user]);
 
+  const loadMoreOrders = useCallback(async () => {
+    if (!nextUrl) return;
+    const request = latestRequest.current;
+    const res = await authApi().get(nextUrl);
+    if (request !== latestRequest.current) return;
+    setOrders((prev) => [...prev, ...(res.data.results || [])]);
+    setNextUrl(res.data.next || null);
+  }, [nextUrl]);
+
   useEffect(() => {
   if (user) {
     loadOrders();
@@ -52,7 +68,7 @@ export const OrderProvider = ({ children }) => {
   };
 
   return (
-    <OrderContext.Provider value={{ orders, setOrders, addOrder, updateOrder, loadOrders }}>
+    <OrderContext.Provider value={{ orders, setOrders, addOrder, updateOrder, loadOrders, loadMoreOrders, hasMoreOrders: !!nextUrl }}>
       {children}
     </OrderContext.Provider>
   );
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useContext } from 'react';
+import React, { useState, useEffect, useContext, useCallback } from 'react';
 import { Container, Card, Button, Alert, Spinner, Row, Col, Badge, ListGroup } from 'react-bootstrap';
 import { Link, Navigate } from 'react-router-dom';
 import moment from 'moment';
@@ -13,25 +13,28 @@ const BookingHistory = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
+    const [nextUrl, setNextUrl] = useState(null);
+
+    const loadBookings = useCallback(async (url = null) => {
+        if (!user) return;
+        try {
+            if (!url) setLoading(true);
+            setError(null);
+            const res = await authApi().get(url || endpoints['bookings']);
+            const bookingsData = res.data.results || (Array.isArray(res.data) ? res.data : []);
+            setBookings(current => url ? [...current, ...bookingsData] : bookingsData);
+            setNextUrl(res.data.next || null);
+        } catch (err) {
+            console.error("Lỗi khi tải lịch sử đặt bàn:", err);
+            setError("Không thể tải được dữ liệu. Vui lòng thử lại.");
+        } finally {
+            setLoading(false);
+        }
+    }, [user]);
+
     useEffect(() => {
-        const loadBookings = async () => {
-            if (user) {
-                try {
-                    setLoading(true);
-                    setError(null);
-                    const res = await authApi().get(endpoints['bookings']);
-                    const bookingsData = res.data.results || (Array.isArray(res.data) ? res.data : []);
-                    setBookings(bookingsData);
-                } catch (err) {
-                    console.error("Lỗi khi tải lịch sử đặt bàn:", err);
-                    setError("Không thể tải được dữ liệu. Vui lòng thử lại.");
-                } finally {
-                    setLoading(false);
-                }
-            }
-        };
         loadBookings();
-    }, [user]);
+    }, [loadBookings]);
 
     const cancelBooking = async (bookingId) => {
         if (window.confirm("Bạn có chắc chắn muốn hủy yêu cầu đặt bàn này không?")) {
@@ -158,6 +161,12 @@ const BookingHistory = () => {
                     })}
                 </Row>
             )}
+
+            {nextUrl && (
+                <div className="text-center mt-3">
+                    <Button variant="outline-primary" onClick={() => loadBookings(nextUrl)}>Tải thêm</Button>
+                </div>
+            )}
         </Container>
     );
 };
@@ -33,6 +33,8 @@ const DishDetail = () => {
 
     const [dish, setDish] = useState(null);
     const [reviews, setReviews] = useState([]);
+    const [nextUrl, setNextUrl] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
@@ -51,7 +53,8 @@ const DishDetail = () => {
                     Apis.get(endpoints['dish-reviews'](dishId))
                 ]);
                 setDish(dishRes.data);
-                setReviews(reviewsRes.data);
+                setReviews(reviewsRes.data.results || reviewsRes.data);
+                setNextUrl(reviewsRes.data.next || null);
             } catch (err) {
                 console.error("Lỗi khi tải dữ liệu:", err);
                 setError("Không thể tải dữ liệu.");
@@ -62,6 +65,20 @@ const DishDetail = () => {
         loadData();
     }, [dishId]);
 
+    const loadMoreReviews = async () => {
+        setLoadingMore(true);
+        try {
+            const res = await Apis.get(nextUrl);
+            setReviews(current => [...current, ...res.data.results]);
+            setNextUrl(res.data.next || null);
+        } catch (err) {
+            console.error("Lỗi khi tải thêm đánh giá:", err);
+            alert("Không thể tải thêm đánh giá. Vui lòng thử lại.");
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleAddReview = async (e) => {
         e.preventDefault();
         setIsSubmitting(true);
@@ -314,6 +331,14 @@ const DishDetail = () => {
                             </ListGroup.Item>
                         ))}
                     </ListGroup>
+
+                    {nextUrl && (
+                        <div className="text-center">
+                            <Button variant="outline-danger" onClick={loadMoreReviews} disabled={loadingMore}>
+                                {loadingMore ? <Spinner animation="border" size="sm" /> : "Tải thêm"}
+                            </Button>
+                        </div>
+                    )}
                 </Col>
 
                 <Col md={5}>
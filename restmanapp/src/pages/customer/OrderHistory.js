@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useContext } from 'react';
+import React, { useState, useEffect, useContext, useCallback } from 'react';
 import { Container, Card, Button, Alert, Spinner, Row, Col, Badge, ListGroup, Image } from 'react-bootstrap';
 import { Link, Navigate } from 'react-router-dom';
 import moment from 'moment';
@@ -14,27 +14,29 @@ const OrderHistory = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
-    useEffect(() => {
-        const loadOrders = async () => {
-            if (user) {
-                try {
-                    setLoading(true);
-                    setError(null);
-                    const res = await authApi().get(endpoints['orders']);
-                    const ordersData = res.data.results || (Array.isArray(res.data) ? res.data : []);
-                    setOrders(ordersData);
-                } catch (err) {
-                    console.error("Lỗi khi tải lịch sử đặt món:", err);
-                    setError("Không thể tải được dữ liệu. Vui lòng thử lại.");
-                } finally {
-                    setLoading(false);
-                }
-            }
-        };
+    const [nextUrl, setNextUrl] = useState(null);
 
-        loadOrders();
+    const loadOrders = useCallback(async (url = null) => {
+        if (!user) return;
+        try {
+            if (!url) setLoading(true);
+            setError(null);
+            const res = await authApi().get(url || endpoints['orders']);
+            const ordersData = res.data.results || (Array.isArray(res.data) ? res.data : []);
+            setOrders(current => url ? [...current, ...ordersData] : ordersData);
+            setNextUrl(res.data.next || null);
+        } catch (err) {
+            console.error("Lỗi khi tải lịch sử đặt món:", err);
+            setError("Không thể tải được dữ liệu. Vui lòng thử lại.");
+        } finally {
+            setLoading(false);
+        }
     }, [user]);
 
+    useEffect(() => {
+        loadOrders();
+    }, [loadOrders]);
+
 
     const handleCancelOrder = async (orderId) => {
         if (window.confirm("Bạn có chắc chắn muốn hủy đơn hàng này không? Thao tác này không thể hoàn tác.")) {
@@ -341,6 +343,12 @@ const OrderHistory = () => {
                     })}
                 </Row>
             )}
+
+            {nextUrl && (
+                <div className="text-center mt-3">
+                    <Button variant="outline-primary" onClick={() => loadOrders(nextUrl)}>Tải thêm</Button>
+                </div>
+            )}
         </Container>
     );
 };
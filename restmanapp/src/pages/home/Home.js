@@ -8,13 +8,14 @@ import { CheckCircleFill, Search } from "react-bootstrap-icons";
 const Home = () => {
     const { categoryName } = useParams();
     const { addToCart } = useContext(CartContext);
+    const [menu, setMenu] = useState(null);
     const [dishes, setDishes] = useState([]);
-    const [allCategories, setAllCategories] = useState([]);
     const [loading, setLoading] = useState(false);
     const [loadingMore, setLoadingMore] = useState(false);
     const [error, setError] = useState(null);
     const [page, setPage] = useState(1);
-    const [hasMore, setHasMore] = useState(true);
+    const [cursor, setCursor] = useState(null);
+    const [hasMore, setHasMore] = useState(false);
     const [searchQuery, setSearchQuery] = useState("");
     const [debouncedQuery, setDebouncedQuery] = useState("");
     const [successMessage, setSuccessMessage] = useState("");
@@ -28,17 +29,21 @@ const Home = () => {
     };
 
 
-
+    // Toàn bộ thực đơn (danh mục kèm món) chỉ cần một request; /dishes/ chỉ còn dùng cho tìm kiếm
     useEffect(() => {
-        const loadCategories = async () => {
+        const loadMenu = async () => {
+            setLoading(true);
             try {
-                const res = await Apis.get(endpoints["categories"]);
-                setAllCategories(res.data.results || res.data);
+                const res = await Apis.get(endpoints["menu"]);
+                setMenu(res.data.categories);
             } catch (err) {
-                console.error("Lỗi khi tải danh mục:", err);
+                console.error("Lỗi khi tải thực đơn:", err);
+                setError("Không thể tải dữ liệu món ăn. Vui lòng thử lại.");
+            } finally {
+                setLoading(false);
             }
         };
-        loadCategories();
+        loadMenu();
     }, []);
 
     useEffect(() => {
@@ -49,11 +54,12 @@ const Home = () => {
         return () => clearTimeout(timerId);
     }, [searchQuery]);
 
+    const category = menu && categoryName ? menu.find((c) => c.name === categoryName) : null;
+
     useEffect(() => {
         const loadDishes = async () => {
-            if (!allCategories.length && categoryName) return;
+            if (!debouncedQuery || !menu) return;
 
-            setError(null);
             if (page === 1) {
                 setLoading(true);
             } else {
@@ -62,24 +68,13 @@ const Home = () => {
 
             try {
                 const params = new URLSearchParams();
-                params.append("page", page);
-
-                if (categoryName) {
-                    const category = allCategories.find((c) => c.name === categoryName);
-                    if (category) {
-                        params.append("category_id", category.id);
-                    } else {
-                        setError(`Không tìm thấy danh mục "${categoryName}"`);
-                        setDishes([]);
-                        setLoading(false);
-                        setLoadingMore(false);
-                        return;
-                    }
+                if (page > 1 && cursor) {
+                    params.append("cursor", cursor);
                 }
-
-                if (debouncedQuery) {
-                    params.append("q", debouncedQuery);
+                if (category && category.id) {
+                    params.append("category_id", category.id);
                 }
+                params.append("q", debouncedQuery);
 
                 const url = `${endpoints["dishes"]}?${params.toString()}`;
                 const res = await Apis.get(url);
@@ -91,9 +86,11 @@ const Home = () => {
                     setDishes((prev) => [...prev, ...results]);
                 }
 
-                setHasMore(!!res.data.next);
+                const next = res.data.next;
+                setCursor(next ? new URL(next).searchParams.get("cursor") : null);
+                setHasMore(!!next);
             } catch (err) {
-                console.error("Lỗi khi tải món ăn:", err);
+                console.error("Lỗi khi tìm món ăn:", err);
                 if (page === 1) {
                     setError("Không thể tải dữ liệu món ăn. Vui lòng thử lại.");
                 }
@@ -105,7 +102,7 @@ const Home = () => {
         };
 
         loadDishes();
-    }, [categoryName, allCategories, debouncedQuery, page]);
+    }, [menu, category, debouncedQuery, page]);
 
     const loadMore = () => {
         if (hasMore) setPage((prev) => prev + 1);
@@ -115,6 +112,15 @@ const Home = () => {
         return <Alert variant="danger" className="mt-4">{error}</Alert>;
     }
 
+    if (menu && categoryName && !category) {
+        return <Alert variant="danger" className="mt-4">{`Không tìm thấy danh mục "${categoryName}"`}</Alert>;
+    }
+
+    let shownDishes = dishes;
+    if (!debouncedQuery) {
+        shownDishes = category ? category.dishes : (menu || []).flatMap((c) => c.dishes);
+    }
+
 
     return (
         <Container className="my-4">
@@ -168,13 +174,13 @@ const Home = () => {
                 </div>
             )}
 
-            {!loading && dishes.length === 0 ? (
+            {!loading && menu && shownDishes.length === 0 ? (
                 <Alert variant="info" className="text-center">
                     Không tìm thấy món ăn nào phù hợp với yêu cầu của bạn.
                 </Alert>
             ) : (
                 <Row xs={1} md={2} lg={4} className="g-4">
-                    {dishes.map((dish) => (
+                    {shownDishes.map((dish) => (
                         <Col key={dish.id}>
                             <Card
                                 className="h-100 border-0 shadow-lg rounded-4"
@@ -235,7 +241,7 @@ const Home = () => {
                 </Row>
             )}
 
-            {hasMore && !loading && (
+            {debouncedQuery && hasMore && !loading && (
                 <div className="text-center my-4">
                     <Button
                         variant="outline-danger"
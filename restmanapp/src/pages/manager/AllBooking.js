@@ -40,19 +40,23 @@ const AllBookings = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [filterStatus, setFilterStatus] = useState('ALL');
+    const [nextUrl, setNextUrl] = useState(null);
 
-    const loadBookings = useCallback(async () => {
+    const loadBookings = useCallback(async (url = null) => {
         if (!user) return;
         try {
-            const res = await authApi().get(endpoints['bookings']);
-            setBookings(res.data.results || res.data);
+            const params = filterStatus === 'ALL' ? {} : { status: filterStatus };
+            const res = url ? await authApi().get(url) : await authApi().get(endpoints['bookings'], { params });
+            const results = res.data.results || res.data;
+            setBookings(current => url ? [...current, ...results] : results);
+            setNextUrl(res.data.next || null);
         } catch (err) {
             console.error("Lỗi khi tải danh sách đặt bàn:", err);
             setError("Không thể tải dữ liệu. Vui lòng thử lại.");
         } finally {
             setLoading(false);
         }
-    }, [user]);
+    }, [user, filterStatus]);
 
     useEffect(() => {
         moment.locale('vi');
@@ -145,6 +149,12 @@ const AllBookings = () => {
                     )}
                 </tbody>
             </Table>
+
+            {nextUrl && (
+                <div className="text-center">
+                    <Button variant="outline-primary" onClick={() => loadBookings(nextUrl)}>Tải thêm</Button>
+                </div>
+            )}
         </Container>
     );
 };
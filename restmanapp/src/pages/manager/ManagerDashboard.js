@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useContext } from 'react';
-import { Container, Card, Button, Alert, Spinner, Row, Col, Badge } from 'react-bootstrap';
+import { Container, Card, Button, Alert, Spinner, Row, Col, Badge, Form } from 'react-bootstrap';
 import { Link, Navigate } from 'react-router-dom';
 import moment from 'moment';
 import { UserContext } from '../../configs/UserContext';
@@ -10,6 +10,19 @@ const ManagerDashboard = () => {
     const [pendingBookings, setPendingBookings] = useState([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    const [assignDate, setAssignDate] = useState(moment().format('YYYY-MM-DD'));
+    const [assigning, setAssigning] = useState(false);
+    const [nextUrl, setNextUrl] = useState(null);
+
+    const loadMore = async () => {
+        try {
+            const res = await authApi().get(nextUrl);
+            setPendingBookings(prev => [...prev, ...res.data.results]);
+            setNextUrl(res.data.next || null);
+        } catch (err) {
+            console.error("Lỗi khi tải thêm yêu cầu:", err);
+        }
+    };
 
     useEffect(() => {
         const loadPendingBookings = async () => {
@@ -18,7 +31,8 @@ const ManagerDashboard = () => {
                     setLoading(true);
                     setError(null);
                     const res = await authApi().get(endpoints['pending-bookings']);
-                    setPendingBookings(res.data);
+                    setPendingBookings(res.data.results || res.data);
+                    setNextUrl(res.data.next || null);
                 } catch (err) {
                     console.error("Lỗi khi tải danh sách đặt bàn:", err);
                     setError("Không thể tải dữ liệu. Vui lòng thử lại.");
@@ -30,6 +44,21 @@ const ManagerDashboard = () => {
         loadPendingBookings();
     }, [user]);
 
+    const handleAutoAssign = async () => {
+        setAssigning(true);
+        try {
+            const res = await authApi().post(endpoints['auto-assign-bookings'], { date: assignDate, apply: true });
+            const assignedIds = res.data.assignments.map(a => a.booking_id);
+            setPendingBookings(prev => prev.filter(b => !assignedIds.includes(b.id)));
+            alert(`Đã gán bàn cho ${assignedIds.length} đơn. Còn ${res.data.unassigned.length} đơn chưa đủ bàn.`);
+        } catch (err) {
+            console.error("Lỗi khi tự động gán bàn:", err);
+            alert("Không thể tự động gán bàn. Vui lòng thử lại.");
+        } finally {
+            setAssigning(false);
+        }
+    };
+
     if (!user || !['WAITER', 'MANAGER', 'ADMIN'].includes(user.role)) {
         return <Navigate to="/" />;
     }
@@ -61,6 +90,15 @@ const ManagerDashboard = () => {
             </h1>
             <h2 className="h5 mb-4" style={{ color: '#1a73e8', fontWeight: '600' }}>Yêu cầu đang chờ xác nhận</h2>
 
+            {user.role === 'MANAGER' && (
+                <div className="d-flex align-items-center mb-4">
+                    <Form.Control type="date" value={assignDate} onChange={(e) => setAssignDate(e.target.value)} style={{ maxWidth: '200px' }} />
+                    <Button className="ms-2" variant="primary" disabled={assigning} onClick={handleAutoAssign}>
+                        {assigning ? <Spinner size="sm" /> : "Tự động gán bàn"}
+                    </Button>
+                </div>
+            )}
+
             {pendingBookings.length === 0 ? (
                 <Alert variant="info" style={{ borderRadius: '8px', backgroundColor: '#d0e4ff', color: '#084298', border: '1px solid #b6d4fe' }}>
                     Không có yêu cầu đặt bàn nào đang chờ.
@@ -102,6 +140,12 @@ const ManagerDashboard = () => {
                     ))}
                 </Row>
             )}
+
+            {nextUrl && (
+                <div className="text-center">
+                    <Button variant="outline-primary" onClick={loadMore}>Tải thêm</Button>
+                </div>
+            )}
         </Container>
     );
 };
@@ -1,4 +1,4 @@
-import React, { useContext, useEffect, useState } from 'react';
+import React, { useCallback, useContext, useEffect, useState } from 'react';
 import { Container, Table, Spinner, Alert, Badge, Form, InputGroup, FormControl, Button, Modal } from 'react-bootstrap';
 import { Link } from 'react-router-dom';
 import moment from 'moment';
@@ -37,9 +37,12 @@ const StatusBadge = ({ status }) => {
 };
 
 const OrderManagement = () => {
-  const { orders, loadOrders, updateOrder } = useContext(OrderContext);
+  const { orders, loadOrders, loadMoreOrders, hasMoreOrders, updateOrder } = useContext(OrderContext);
   const [loading, setLoading] = useState(false);
   const [filterStatus, setFilterStatus] = useState('ALL');
+  const [fromDate, setFromDate] = useState('');
+  const [toDate, setToDate] = useState('');
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchId, setSearchId] = useState('');
   const [showUpdateModal, setShowUpdateModal] = useState(false);
   const [selectedOrder, setSelectedOrder] = useState(null);
@@ -49,19 +52,40 @@ const OrderManagement = () => {
   const [error, setError] = useState(null);
 
 
+  // Trạng thái và khoảng ngày được lọc ở server; ô tìm mã chỉ lọc trong các hóa đơn đã tải
+  const buildFilters = useCallback(() => {
+    const filters = {};
+    if (filterStatus !== 'ALL') filters.status = filterStatus;
+    if (fromDate) filters.from = fromDate;
+    if (toDate) filters.to = toDate;
+    return filters;
+  }, [filterStatus, fromDate, toDate]);
+
   const handleRefresh = async () => {
     setLoading(true);
-    await loadOrders(true); // 👈 thêm flag forceReload
+    await loadOrders(true, buildFilters()); // 👈 thêm flag forceReload
     setLoading(false);
   };
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      await loadMoreOrders();
+    } catch (err) {
+      console.error("Lỗi khi tải thêm hóa đơn:", err);
+      alert("Không thể tải thêm hóa đơn. Vui lòng thử lại.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
 
   useEffect(() => {
     moment.locale('vi');
     const fetchData = async () => {
       try {
         setLoading(true);
-        await loadOrders();
+        await loadOrders(false, buildFilters());
       } catch (err) {
         console.error("Lỗi khi tải hóa đơn:", err);
         setError("Không thể tải dữ liệu hóa đơn");
@@ -70,7 +94,7 @@ const OrderManagement = () => {
       }
     };
     fetchData();
-  }, [loadOrders]);
+  }, [loadOrders, buildFilters]);
 
   const handleOpenModal = (order) => {
     setSelectedOrder(order);
@@ -142,6 +166,14 @@ const OrderManagement = () => {
               <option value="CANCELLED">Đã hủy</option>
             </Form.Select>
           </Form.Group>
+          <Form.Group style={{ maxWidth: '200px' }}>
+            <Form.Label className="fw-bold" style={{ color: '#1a73e8' }}>Từ ngày:</Form.Label>
+            <Form.Control type="date" value={fromDate} onChange={(e) => setFromDate(e.target.value)} />
+          </Form.Group>
+          <Form.Group style={{ maxWidth: '200px' }}>
+            <Form.Label className="fw-bold" style={{ color: '#1a73e8' }}>Đến ngày:</Form.Label>
+            <Form.Control type="date" value={toDate} onChange={(e) => setToDate(e.target.value)} />
+          </Form.Group>
           <Form.Group style={{ maxWidth: '300px' }}>
             <Form.Label className="fw-bold" style={{ color: '#1a73e8' }}>Tìm theo mã hóa đơn:</Form.Label>
             <InputGroup>
@@ -191,6 +223,14 @@ const OrderManagement = () => {
             )}
           </tbody>
         </Table>
+
+        {hasMoreOrders && (
+          <div className="text-center">
+            <Button variant="outline-primary" onClick={handleLoadMore} disabled={loadingMore}>
+              {loadingMore ? <Spinner animation="border" size="sm" /> : "Tải thêm"}
+            </Button>
+          </div>
+        )}
       </Container>
 
       {/* Modal cập nhật */}
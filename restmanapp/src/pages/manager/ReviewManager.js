@@ -27,7 +27,9 @@ const ReviewManagement = () => {
     const [replyingTo, setReplyingTo] = useState(null); 
     const [replyContent, setReplyContent] = useState('');
 
-    const loadReviews = useCallback(async () => {
+    const [nextUrl, setNextUrl] = useState(null);
+
+    const loadReviews = useCallback(async (url = null) => {
         if (!user || !['WAITER', 'MANAGER', 'ADMIN'].includes(user.role)) {
             setError("Bạn không có quyền truy cập trang này.");
             setLoading(false);
@@ -35,11 +37,12 @@ const ReviewManagement = () => {
         }
 
         try {
-            setLoading(true);
-            const res = await authApi().get(endpoints['all-reviews']);
+            if (!url) setLoading(true);
+            const res = await authApi().get(url || endpoints['all-reviews']);
             const data = res.data.results || res.data;
             if (Array.isArray(data)) {
-                setReviews(data);
+                setReviews(current => url ? [...current, ...data] : data);
+                setNextUrl(res.data.next || null);
             } else {
                 throw new Error("Dữ liệu trả về không hợp lệ.");
             }
@@ -150,6 +153,12 @@ const ReviewManagement = () => {
                     <Alert variant="info">Chưa có đánh giá nào từ khách hàng.</Alert>
                 )}
             </ListGroup>
+
+            {nextUrl && (
+                <div className="text-center">
+                    <Button variant="outline-primary" onClick={() => loadReviews(nextUrl)}>Tải thêm</Button>
+                </div>
+            )}
         </Container>
     );
 };
@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useContext } from 'react';
 import { Container, Row, Col, Card, Spinner, Alert, Badge, Dropdown } from 'react-bootstrap';
-import { authApi, endpoints } from '../../configs/Apis';
+import { authApi, endpoints, eventSource } from '../../configs/Apis';
 import { UserContext } from '../../configs/UserContext';
 
 const getStatusProps = (status) => {
@@ -16,6 +16,8 @@ const getStatusProps = (status) => {
     }
 };
 
+const POLL_INTERVAL = 10000;
+
 const TableStatusDashboard = () => {
     const { user } = useContext(UserContext);
     const [tables, setTables] = useState([]);
@@ -24,7 +26,6 @@ const TableStatusDashboard = () => {
 
     const loadTables = async () => {
         try {
-            setLoading(true);
             const res = await authApi().get(endpoints['table-statuses']);
             setTables(res.data);
         } catch (err) {
@@ -37,7 +38,34 @@ const TableStatusDashboard = () => {
 
     useEffect(() => {
         if (user && ['WAITER', 'MANAGER', 'ADMIN'].includes(user.role)) {
+            // Luôn tải dữ liệu ban đầu: luồng sự kiện chỉ có khi backend chạy bằng ASGI
             loadTables();
+            let poller = null;
+            const source = eventSource(endpoints['table-stream']);
+            source.addEventListener('snapshot', (e) => {
+                setTables(JSON.parse(e.data));
+                setLoading(false);
+            });
+            source.addEventListener('table', (e) => {
+                const changed = JSON.parse(e.data);
+                setTables(currentTables => {
+                    const exists = currentTables.some(t => t.id === changed.id);
+                    return exists
+                        ? currentTables.map(t => t.id === changed.id ? { ...t, ...changed } : t)
+                        : [...currentTables, changed];
+                });
+            });
+            source.addEventListener('resync', () => loadTables());
+            source.onerror = () => {
+                // Trình duyệt tự kết nối lại khi mất kết nối; nếu server từ chối luồng (WSGI) thì chuyển sang tải lại định kỳ
+                if (source.readyState === EventSource.CLOSED && !poller) {
+                    poller = setInterval(loadTables, POLL_INTERVAL);
+                }
+            };
+            return () => {
+                source.close();
+                if (poller) clearInterval(poller);
+            };
         } else {
             setError("Bạn không có quyền truy cập trang này.");
             setLoading(false);